@@ -1,5 +1,12 @@
 import random
+from heapq import heapify, heappush, heappop
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations, count, islice
+from math import comb
+import numpy as np
 import networkx as nx
+from scipy import sparse
 import matplotlib.pyplot as plt
 
 # ===================== STAŁE GLOBALNE =====================
@@ -11,16 +18,20 @@ T_MAX        = 0.01       # maksymalne dopuszczalne opóźnienie (T_max)
 EDGE_RELIABILITY = 0.94   # prawdopodobieństwo, że krawędź działa
 FLOW_PROB    = 0.2         # prawdopodobieństwo, że między daną parą (i,j) jest ruch (wartość 1 pakiet/s)
 MC_ITER      = 1000        # liczba iteracji Monte Carlo do symulacji niezawodności
+MC_CHUNK     = 10000       # liczba iteracji w jednej porcji symulacji równoległej
+EDGE_MTTR    = 24          # średni czas naprawy krawędzi [h]
+EDGE_MTBF    = EDGE_MTTR * EDGE_RELIABILITY / (1 - EDGE_RELIABILITY)  # średni czas między awariami [h], dostępność = EDGE_RELIABILITY
+HOURS_PER_YEAR = 8760
 # ============================================================
 
-def create_graph():
+def create_graph(capacity_min=CAPACITY_MIN, capacity_max=CAPACITY_MAX):
     """
     Tworzy graf G o NUM_NODES wierzchołkach:
       - Najpierw budowany jest cykl, aby zapewnić, że żaden wierzchołek nie jest izolowany.
       - Następnie dodajemy EXTRA_EDGES losowych krawędzi (przy czym |E| < 30).
       
     Każdej krawędzi przypisujemy:
-      - capacity: przepustowość (w bitach/s) z zakresu [CAPACITY_MIN, CAPACITY_MAX]
+      - capacity: przepustowość (w bitach/s) z zakresu [capacity_min, capacity_max]
       - cost: koszt używany przy wyszukiwaniu ścieżki, losowany z zakresu [COST_MIN, COST_MAX]
     """
 
@@ -35,9 +46,9 @@ def create_graph():
         
     for k in krawedzie:
         if k[2] == 0:
-            cap = random.randint(CAPACITY_MIN, CAPACITY_MAX)
+            cap = random.randint(capacity_min, capacity_max)
         else:
-            cap = random.randint(CAPACITY_MIN, CAPACITY_MAX)
+            cap = random.randint(capacity_min, capacity_max)
             # cap = k[2] * PACKET_SIZE
         cost = 1
         G.add_edge(k[0], k[1], capacity=cap, cost=cost)
@@ -66,26 +77,138 @@ def create_flow_matrix():
                 N[(i, j)] = random.randint(1, 10)
     return N
 
-def compute_routing_flows(G, N):
+def traffic_rows(N):
+    """
+    Przechodzi macierz natężeń N wiersz po wierszu (wg źródła), zwracając tylko niezerowy ruch.
+    N może być:
+      - słownikiem {(i, j): n} (jak z create_flow_matrix),
+      - gęstą tablicą NumPy (również np.memmap z load_traffic_matrix),
+      - macierzą rzadką w stylu SciPy (obiektem z metodą tocsr()).
+    Dla tablic wiersz i oraz kolumna j to wierzchołki o etykietach i oraz j.
+
+    Zwraca generator krotek (src, dsts, flows); dla tablic dsts i flows to tablice NumPy,
+    więc ruch nigdy nie jest rozbijany na pojedyncze obiekty Pythona.
+    """
+    if hasattr(N, 'tocsr'):
+        csr = N.tocsr()
+        for src in range(csr.shape[0]):
+            start, end = csr.indptr[src], csr.indptr[src + 1]
+            dsts = csr.indices[start:end]
+            flows = csr.data[start:end]
+            positive = flows > 0
+            if positive.any():
+                yield src, dsts[positive], flows[positive]
+    elif isinstance(N, np.ndarray):
+        for src in range(N.shape[0]):
+            row = np.asarray(N[src])
+            dsts = np.flatnonzero(row > 0)
+            if len(dsts):
+                yield src, dsts, row[dsts]
+    else:
+        rows = {}
+        for (src, dst), flow in N.items():
+            if flow > 0:
+                dsts, flows = rows.setdefault(src, ([], []))
+                dsts.append(dst)
+                flows.append(flow)
+        for src, (dsts, flows) in rows.items():
+            yield src, dsts, flows
+
+def load_traffic_matrix(path):
+    """
+    Wczytuje macierz natężeń zapisaną przez np.save jako plik .npy, mapując ją do pamięci
+    (mmap_mode='r'), więc nawet duże macierze nie są wczytywane w całości.
+    Wynik można podać jako N do funkcji symulacji.
+    """
+    N = np.load(path, mmap_mode='r')
+    if N.ndim != 2 or N.shape[0] != N.shape[1]:
+        raise ValueError(f"Macierz natężeń musi być kwadratowa, a ma wymiary {N.shape}")
+    return N
+
+def shortest_path_tree(G, src, unit_cost=False):
+    """
+    Buduje drzewo najkrótszych ścieżek (wg atrybutu 'cost') z wierzchołka src.
+    Remisy rozstrzygane są tak jak w nx.single_source_dijkstra_path: poprzednikiem zostaje
+    pierwszy sąsiad, przez którego wierzchołek osiągnięto (w kolejności sąsiedztwa G).
+    Dla unit_cost=True (wszystkie koszty równe 1) zamiast kopca używany jest BFS,
+    który daje dokładnie to samo drzewo.
+
+    Zwraca:
+      - parent: słownik poprzedników (parent[src] = None), zawiera tylko osiągalne wierzchołki
+      - order: wierzchołki w kolejności niemalejącej odległości od src
+    """
+    adj = G.adj
+    parent = {src: None}
+    if unit_cost:
+        order = [src]
+        for v in order:
+            for u in adj[v]:
+                if u not in parent:
+                    parent[u] = v
+                    order.append(u)
+        return parent, order
+
+    order = []
+    dist = {}
+    seen = {src: 0}
+    c = count()
+    fringe = [(0, next(c), src)]
+    while fringe:
+        d, _, v = heappop(fringe)
+        if v in dist:
+            continue
+        dist[v] = d
+        order.append(v)
+        for u, attr in adj[v].items():
+            vu_dist = d + attr.get('cost', 1)
+            if u in dist:
+                continue
+            if u not in seen or vu_dist < seen[u]:
+                seen[u] = vu_dist
+                parent[u] = v
+                heappush(fringe, (vu_dist, next(c), u))
+    return parent, order
+
+def compute_routing_flows(G, N, mode='pair', baseline=None):
     """
     Dla danego grafu G i macierzy natężeń N oblicza rzeczywiste przepływy a(e) na krawędziach.
     Dla każdej pary (src, dst) z N[src,dst] > 0 wyszukuje najkrótszą ścieżkę wg atrybutu 'cost'
     i dodaje wartość n(src,dst) do każdej krawędzi na tej ścieżce.
+    N może być słownikiem, tablicą NumPy lub macierzą rzadką (zob. traffic_rows).
+
+    Tryby trasowania:
+      - 'pair': osobne nx.shortest_path dla każdej pary (remisy jak w dwukierunkowym Dijkstrze)
+      - 'tree': jedno drzewo najkrótszych ścieżek na źródło (shortest_path_tree); ruch do wszystkich
+                celów spychany jest od liści do korzenia, więc obciążenia z jednego źródła
+                wychodzą z jednego przejścia O(V+E). Ścieżki mają te same koszty co w trybie 'pair',
+                ale przy równych kosztach remisy mogą zostać rozstrzygnięte inaczej.
+    Z podanym baseline (BaselineRouting policzonym dla pełnego grafu i tego samego N) G traktowany
+    jest jako stan awarii pełnego grafu: przeliczane są tylko drzewa źródeł, które używały
+    uszkodzonych krawędzi (tryb 'tree' niezależnie od mode). Jako baseline można też podać
+    FastReroute - wtedy pary przechodzą na pierwszą działającą z wcześniej policzonych ścieżek.
     
     Zwraca:
       - flow_on_edge: słownik, gdzie kluczem jest uporządkowana krotka (u, v) a wartością suma ruchu
       - total_flow: całkowity ruch (suma n(i,j)) wszystkich par
     Jeśli dla którejś pary nie uda się znaleźć ścieżki, zwraca (None, None).
     """
+    if baseline is not None:
+        return baseline.reroute(G, baseline.failed_edges(G))
+
     # Inicjujemy przepływy na krawędziach
     flow_on_edge = {}
     for u, v, attr in G.edges(data=True):
         key = tuple(sorted((u, v)))
         flow_on_edge[key] = 0
+
+    if mode == 'tree':
+        return _tree_routing_flows(G, N, flow_on_edge)
+    if mode != 'pair':
+        raise ValueError(f"Nieznany tryb trasowania: {mode}")
     
     total_flow = 0
-    for (src, dst), flow in N.items():
-        if flow > 0:
+    for src, dsts, flows in traffic_rows(N):
+        for dst, flow in zip(dsts, flows):
             try:
                 path = nx.shortest_path(G, source=src, target=dst, weight='cost')
             except nx.NetworkXNoPath:
@@ -103,6 +226,487 @@ def compute_routing_flows(G, N):
     
     return flow_on_edge, total_flow
 
+def _group_demands(N):
+    """
+    Grupuje niezerowy ruch z N wg źródła.
+    Zwraca słownik src -> lista (dst, flow) oraz całkowity ruch (sumowany w kolejności N).
+    """
+    demands = {}
+    total_flow = 0
+    for src, dsts, flows in traffic_rows(N):
+        for flow in flows:
+            total_flow += flow
+        demands[src] = list(zip(dsts, flows))
+    return demands, total_flow
+
+def _is_unit_cost(G):
+    return all(attr.get('cost', 1) == 1 for _, _, attr in G.edges(data=True))
+
+def _source_loads(G, src, targets, unit_cost):
+    """
+    Obciążenia krawędzi wnoszone przez ruch z jednego źródła: sumuje ruch w poddrzewach
+    drzewa najkrótszych ścieżek, od liści w stronę korzenia.
+    Zwraca słownik (u, v) -> a albo None, jeśli któryś cel jest nieosiągalny.
+    """
+    parent, order = shortest_path_tree(G, src, unit_cost)
+    subtree = {}
+    for dst, flow in targets:
+        if dst not in parent:
+            return None
+        subtree[dst] = subtree.get(dst, 0) + flow
+    loads = {}
+    # Wierzchołki od najdalszych: ruch poddrzewa v przechodzi przez krawędź (parent[v], v)
+    for v in reversed(order):
+        a = subtree.get(v)
+        if not a or v == src:
+            continue
+        u = parent[v]
+        loads[tuple(sorted((u, v)))] = a
+        subtree[u] = subtree.get(u, 0) + a
+    return loads
+
+def _tree_routing_flows(G, N, flow_on_edge):
+    """
+    Tryb 'tree' funkcji compute_routing_flows: grupuje ruch wg źródła i dodaje obciążenia
+    z drzewa najkrótszych ścieżek każdego źródła.
+    """
+    demands, total_flow = _group_demands(N)
+    unit_cost = _is_unit_cost(G)
+    for src, targets in demands.items():
+        loads = _source_loads(G, src, targets, unit_cost)
+        if loads is None:
+            return None, None
+        for key, a in loads.items():
+            flow_on_edge[key] += a
+    return flow_on_edge, total_flow
+
+class Topology:
+    """
+    Zwarta, tablicowa reprezentacja topologii do gorącej pętli symulacji.
+    Wierzchołki numerowane są 0..V-1 w kolejności G.nodes, krawędzie 0..E-1 w kolejności G.edges().
+    Sąsiedztwo zapisane jest w formacie CSR: sąsiedzi wierzchołka v to neighbors[indptr[v]:indptr[v+1]],
+    a edge_ids pod tymi samymi indeksami to numery łączących krawędzi. Sąsiedzi ułożeni są wg numeru
+    krawędzi, czyli tak jak w G_oper z operational_graph, więc drzewa najkrótszych ścieżek są takie same
+    jak w trybie 'tree' na G_oper. Wszystkie przeszukiwania idą po tych tablicach (pętle Pythona po ich
+    kopiach w listach, wsadowy BFS bezpośrednio po tablicach NumPy).
+    Przepustowości i koszty to wektory NumPy, a stan awarii to maska bool nad numerami krawędzi.
+    """
+    def __init__(self, nodes, edges, capacity, cost):
+        self.nodes = list(nodes)
+        self.position = {v: i for i, v in enumerate(self.nodes)}
+        self.edges = np.array(edges, dtype=int).reshape(-1, 2)
+        self.capacity = np.asarray(capacity, dtype=float)
+        self.cost = np.asarray(cost, dtype=float)
+        self.keys = [tuple(sorted((self.nodes[u], self.nodes[v]))) for u, v in self.edges.tolist()]
+        self.unit_cost = bool((self.cost == 1).all())
+
+        num_nodes = len(self.nodes)
+        # Każda krawędź (u, v) to wpis w wierszu u i w wierszu v (pętla własna tylko raz),
+        # w wierszu posortowane wg numeru krawędzi
+        edge_numbers = np.arange(len(self.edges))
+        proper = self.edges[:, 0] != self.edges[:, 1]
+        owner = np.concatenate([self.edges[:, 0], self.edges[proper, 1]])
+        other = np.concatenate([self.edges[:, 1], self.edges[proper, 0]])
+        edge_ids = np.concatenate([edge_numbers, edge_numbers[proper]])
+        order = np.lexsort((edge_ids, owner))
+        self.indptr = np.concatenate([[0], np.cumsum(np.bincount(owner, minlength=num_nodes))])
+        self.neighbors = other[order]
+        self.edge_ids = edge_ids[order]
+        # Kopie tablic CSR jako listy Pythona do pętli przeszukiwania - szybsze niż indeksowanie
+        # tablic NumPy element po elemencie
+        self._indptr = self.indptr.tolist()
+        self._neighbors = self.neighbors.tolist()
+        self._edge_ids = self.edge_ids.tolist()
+        self._ends = self.edges.tolist()
+        self._cost = self.cost.tolist()
+        # Do wsadowego BFS (shortest_path_trees): wiersz v tablic CSR to łuki wchodzące do v
+        # (z neighbors[i] krawędzią edge_ids[i]); _arc_starts to początki niepustych wierszy
+        arc_to = np.repeat(np.arange(num_nodes), np.diff(self.indptr))
+        self._arcs = (self.neighbors, arc_to, self.edge_ids)
+        self._arc_targets = np.flatnonzero(np.diff(self.indptr))
+        self._arc_starts = self.indptr[self._arc_targets]
+
+    @property
+    def num_nodes(self):
+        return len(self.nodes)
+
+    @property
+    def num_edges(self):
+        return len(self.edges)
+
+    @classmethod
+    def from_networkx(cls, G):
+        """Buduje topologię z grafu networkx (atrybuty 'capacity' i 'cost' krawędzi)."""
+        position = {v: i for i, v in enumerate(G.nodes)}
+        edges = [(position[u], position[v]) for u, v in G.edges()]
+        capacity = [attr.get('capacity', 0) for _, _, attr in G.edges(data=True)]
+        cost = [attr.get('cost', 1) for _, _, attr in G.edges(data=True)]
+        return cls(G.nodes, edges, capacity, cost)
+
+    def to_networkx(self, up=None):
+        """Zwraca nx.Graph z działającymi krawędziami (wszystkimi, gdy up=None)."""
+        G = nx.Graph()
+        G.add_nodes_from(self.nodes)
+        for e, (u, v) in enumerate(self._ends):
+            if up is None or up[e]:
+                capacity = self.capacity[e].item()
+                G.add_edge(self.nodes[u], self.nodes[v], capacity=int(capacity) if capacity.is_integer() else capacity,
+                           cost=self._cost[e])
+        return G
+
+    def group_demands(self, N):
+        """
+        Agreguje ruch z N (zob. traffic_rows) wg źródła, wiersz po wierszu.
+        Zwraca słownik numer źródła -> (tablica numerów celów, tablica natężeń) oraz całkowity ruch.
+        """
+        identity = self.nodes == list(range(len(self.nodes)))
+        demands = {}
+        total_flow = 0
+        for src, dsts, flows in traffic_rows(N):
+            if isinstance(flows, list):
+                for flow in flows:
+                    total_flow += flow
+            else:
+                total_flow += flows.sum()
+            dsts = np.asarray(dsts) if identity else np.array([self.position[dst] for dst in dsts], dtype=int)
+            demands[self.position[src]] = (dsts, np.asarray(flows, dtype=float))
+        return demands, total_flow
+
+    def shortest_path_tree(self, src, up=None):
+        """
+        Drzewo najkrótszych ścieżek z wierzchołka src (numer w topologii) po krawędziach działających
+        wg maski up (lista bool; None = wszystkie). Remisy jak w shortest_path_tree na G_oper.
+        Zwraca (parent_edge, order): parent_edge[v] to numer krawędzi do poprzednika v (-1 dla src
+        i wierzchołków nieosiągalnych), order to osiągnięte wierzchołki w kolejności niemalejącej odległości.
+        """
+        indptr, neighbors, edge_ids = self._indptr, self._neighbors, self._edge_ids
+        num_nodes = self.num_nodes
+        parent_edge = [-1] * num_nodes
+        reached = [False] * num_nodes
+        reached[src] = True
+        if self.unit_cost:
+            order = [src]
+            for v in order:
+                for i in range(indptr[v], indptr[v + 1]):
+                    w, e = neighbors[i], edge_ids[i]
+                    if not reached[w] and (up is None or up[e]):
+                        reached[w] = True
+                        parent_edge[w] = e
+                        order.append(w)
+            return parent_edge, order
+
+        cost = self._cost
+        order = []
+        done = [False] * num_nodes
+        seen = {src: 0}
+        c = count()
+        fringe = [(0, next(c), src)]
+        while fringe:
+            d, _, v = heappop(fringe)
+            if done[v]:
+                continue
+            done[v] = True
+            order.append(v)
+            for i in range(indptr[v], indptr[v + 1]):
+                w, e = neighbors[i], edge_ids[i]
+                if done[w] or not (up is None or up[e]):
+                    continue
+                vw_dist = d + cost[e]
+                if w not in seen or vw_dist < seen[w]:
+                    seen[w] = vw_dist
+                    parent_edge[w] = e
+                    heappush(fringe, (vw_dist, next(c), w))
+        return parent_edge, order
+
+    def source_loads(self, src, targets, up=None, tree=None):
+        """
+        Obciążenia wnoszone przez ruch z src do celów targets - pary tablic (numery celów, natężenia)
+        z group_demands. Ruch całego wiersza sumowany jest w poddrzewach od liści do korzenia.
+        tree to opcjonalne, już policzone drzewo (parent_edge, order) z shortest_path_tree(src, up).
+        Zwraca słownik numer krawędzi -> obciążenie albo None, jeśli któryś cel jest nieosiągalny.
+        """
+        dsts, flows = targets
+        parent_edge, order = tree if tree is not None else self.shortest_path_tree(src, up)
+        if len(order) < self.num_nodes:
+            unreachable = (np.array(parent_edge)[dsts] < 0) & (dsts != src)
+            if unreachable.any():
+                return None
+        subtree = np.bincount(dsts, weights=flows, minlength=self.num_nodes).tolist()
+        loads = {}
+        ends = self._ends
+        for v in reversed(order):
+            a = subtree[v]
+            if not a or v == src:
+                continue
+            e = parent_edge[v]
+            u = ends[e][0] + ends[e][1] - v
+            loads[e] = a
+            subtree[u] += a
+        return loads
+
+    def shortest_path_trees(self, src, states):
+        """
+        Drzewa najkrótszych ścieżek z src dla wielu stanów naraz (states - macierz bool stany x krawędzie),
+        takie same jak z shortest_path_tree dla każdego wiersza.
+        Zwraca macierze (stany x wierzchołki): parent_edge (-1 dla src i wierzchołków nieosiągalnych),
+        position (pozycja w order; num_nodes dla nieosiągalnych) i dist (odległość; inf dla nieosiągalnych).
+
+        Dla kosztów jednostkowych BFS idzie warstwami jednocześnie we wszystkich stanach: wierzchołek
+        następnej warstwy odkrywa sąsiad o najmniejszej pozycji, a kolejność w warstwie wyznacza para
+        (pozycja poprzednika, numer krawędzi) - tak jak w kolejce BFS. Dla innych kosztów drzewa
+        liczone są po kolei.
+        """
+        states = np.asarray(states, dtype=bool)
+        num_states, num_nodes = len(states), self.num_nodes
+        parent_edge = np.full((num_states, num_nodes), -1)
+        position = np.full((num_states, num_nodes), num_nodes)
+        dist = np.full((num_states, num_nodes), float('inf'))
+        if not self.unit_cost:
+            for k, up in enumerate(states.tolist()):
+                tree_parent, order = self.shortest_path_tree(src, up)
+                parent_edge[k] = tree_parent
+                position[k, order] = np.arange(len(order))
+                d = dist[k]
+                d[src] = 0
+                for v in order[1:]:
+                    e = tree_parent[v]
+                    d[v] = d[self._ends[e][0] + self._ends[e][1] - v] + self._cost[e]
+            return parent_edge, position, dist
+
+        # Wewnątrz pętli tablice są transponowane (wierzchołki/łuki x stany) - redukcje po łukach
+        # działają wtedy na ciągłych wierszach
+        arc_from, arc_to, arc_edge = self._arcs
+        arc_edge = arc_edge.astype(np.int32)
+        stride = max(self.num_edges, 1)
+        unreached = num_nodes * stride
+        arc_up = states.T[arc_edge]
+        parent_edge, position, dist = parent_edge.T.copy(), position.T.astype(np.int32), dist.T.copy()
+        position[src] = 0
+        dist[src] = 0
+        frontier = np.zeros((num_nodes, num_states), dtype=bool)
+        frontier[src] = True
+        reached = frontier.copy()
+        next_position = np.ones(num_states, dtype=np.int32)
+        columns = np.arange(num_states)
+        level = 0
+        while True:
+            level += 1
+            candidate = arc_up & frontier[arc_from] & ~reached[arc_to]
+            if not candidate.any():
+                return parent_edge.T, position.T.astype(int), dist.T
+            key = np.where(candidate, position[arc_from] * stride + arc_edge[:, None], unreached)
+            best = np.minimum.reduceat(key, self._arc_starts, axis=0)
+            rank = np.empty_like(best)
+            rank[np.argsort(best, axis=0), columns] = np.arange(len(best), dtype=best.dtype)[:, None]
+            groups, cols = np.nonzero(best < unreached)
+            nodes = self._arc_targets[groups]
+            parent_edge[nodes, cols] = best[groups, cols] % stride
+            position[nodes, cols] = next_position[cols] + rank[groups, cols]
+            dist[nodes, cols] = level
+            frontier[:] = False
+            frontier[nodes, cols] = True
+            reached |= frontier
+            next_position += frontier.sum(axis=0)
+
+    def source_loads_batch(self, src, targets, trees):
+        """
+        Obciążenia wnoszone przez ruch z src do celów targets (jak source_loads) dla wielu stanów naraz,
+        z drzew trees zwróconych przez shortest_path_trees. Poddrzewa sumowane są w tej samej kolejności
+        co w source_loads, więc wyniki są identyczne.
+        Zwraca macierz obciążeń (stany x krawędzie) oraz wektor bool stanów, w których wszystkie cele
+        są osiągalne (dla pozostałych wiersz obciążeń nie ma znaczenia).
+        """
+        parent_edge, position, _ = trees
+        dsts, flows = targets
+        num_states, num_nodes = parent_edge.shape
+        reachable = ((position[:, dsts] < num_nodes) | (dsts == src)).all(axis=1)
+        subtree = np.tile(np.bincount(dsts, weights=flows, minlength=num_nodes), (num_states, 1))
+        parent = self.edges[parent_edge].sum(axis=2) - np.arange(num_nodes)
+        node_at = np.argsort(position, axis=1)
+        loads = np.zeros((num_states, self.num_edges))
+        rows = np.arange(num_states)
+        # Od najdalszych wierzchołków: ruch poddrzewa v przechodzi przez krawędź do poprzednika
+        for i in range(num_nodes - 1, 0, -1):
+            v = node_at[:, i]
+            k = rows[position[rows, v] == i]
+            v = v[k]
+            a = subtree[k, v]
+            loads[k, parent_edge[k, v]] = a
+            subtree[k, parent[k, v]] += a
+        return loads, reachable
+
+    def route(self, demands, up=None):
+        """
+        Obciążenia wszystkich krawędzi (wektor) dla ruchu demands z group_demands w stanie up.
+        Zwraca None, jeśli któraś para z ruchem jest rozłączona.
+        """
+        loads = [0] * self.num_edges
+        for src, targets in demands.items():
+            source = self.source_loads(src, targets, up)
+            if source is None:
+                return None
+            for e, a in source.items():
+                loads[e] += a
+        return np.array(loads, dtype=float)
+
+class PrecomputedRouting:
+    """
+    Wspólna część trasowań liczonych raz na pełnym grafie (BaselineRouting, FastReroute), które można
+    podać jako baseline. Podklasa ustawia keys (klucze krawędzi w kolejności G_full.edges())
+    i total_flow oraz implementuje state_loads(up, failed).
+    """
+    def failed_edges(self, G):
+        """Maska bitowa krawędzi pełnego grafu, których brakuje w G."""
+        mask = 0
+        for e, (u, v) in enumerate(self.keys):
+            if not G.has_edge(u, v):
+                mask |= 1 << e
+        return mask
+
+    def reroute(self, G, failed):
+        """
+        Przepływy w stanie G z maską uszkodzonych krawędzi failed.
+        Zwraca (flow_on_edge, total_flow) tak jak compute_routing_flows albo (None, None).
+        """
+        up = [not failed >> e & 1 for e in range(len(self.keys))]
+        loads = self.state_loads(up, failed)
+        if loads is None:
+            return None, None
+        flow_on_edge = {}
+        for e, a in enumerate(loads.tolist()):
+            if up[e]:
+                flow_on_edge[self.keys[e]] = a
+        return flow_on_edge, self.total_flow
+
+class BaselineRouting(PrecomputedRouting):
+    """
+    Trasowanie bazowe w trybie 'tree', liczone raz na pełnym grafie G_full dla macierzy N.
+    Dla każdego źródła pamięta obciążenia wnoszone przez jego drzewo oraz maskę bitową
+    krawędzi, które to drzewo faktycznie wykorzystuje (numeracja krawędzi jak w G_full.edges()).
+
+    W stanie awarii drzewo źródła, które nie używa żadnej uszkodzonej krawędzi, nie zmienia się,
+    więc reroute przelicza tylko drzewa źródeł dotkniętych awarią, a wektor obciążeń łata:
+    odejmuje ich stare wkłady i dodaje nowe. Koszt zależy od liczby dotkniętych źródeł, a nie od V^2.
+    """
+    def __init__(self, G_full, N):
+        self.topology = Topology.from_networkx(G_full)
+        self.keys = self.topology.keys
+        self.demands, self.total_flow = self.topology.group_demands(N)
+        self.loads = np.zeros(self.topology.num_edges)
+        self.contributions = {}
+        self.used = {}
+        for src, targets in self.demands.items():
+            loads = self.topology.source_loads(src, targets)
+            if loads is None:
+                raise ValueError(f"Brak ścieżki z wierzchołka {self.topology.nodes[src]} w pełnym grafie")
+            edges = np.array(list(loads), dtype=int)
+            values = np.array(list(loads.values()), dtype=float)
+            self.contributions[src] = (edges, values)
+            self.used[src] = sum(1 << e for e in loads)
+            np.add.at(self.loads, edges, values)
+
+    def state_loads(self, up, failed=None):
+        """
+        Wektor obciążeń krawędzi w stanie up (lista bool nad numerami krawędzi) albo None,
+        gdy któraś para z ruchem jest rozłączona. failed to maska bitowa awarii (failure_mask(up)).
+        """
+        if failed is None:
+            failed = failure_mask(up)
+        loads = self.loads.copy()
+        for src, used in self.used.items():
+            if not used & failed:
+                continue
+            edges, values = self.contributions[src]
+            loads[edges] -= values
+            new_loads = self.topology.source_loads(src, self.demands[src], up)
+            if new_loads is None:
+                return None
+            for e, a in new_loads.items():
+                loads[e] += a
+        return loads
+
+class FastReroute(PrecomputedRouting):
+    """
+    Trasowanie w stylu IP fast-reroute: dla każdej pary z ruchem liczonych jest raz, na pełnym grafie,
+    do k najkrótszych ścieżek prostych (nx.shortest_simple_paths wg 'cost'), każda zapisana jako maska
+    bitowa krawędzi (numeracja jak w G_full.edges()). W stanie awarii para wybiera pierwszą ścieżkę,
+    której maska nie ma części wspólnej z maską awarii, więc trasowanie stanu to O(par) operacji bitowych.
+    Tylko pary, którym padły wszystkie ścieżki kandydujące, szukane są od nowa (drzewo najkrótszych
+    ścieżek na Topology); ich liczbę zlicza fallbacks.
+
+    Każda ścieżka stanu awarii jest ścieżką prostą pełnego grafu, więc pierwsza działająca kandydatka
+    jest najkrótszą ścieżką w tym stanie - koszty tras są takie jak w trybie 'tree', a różnić się mogą
+    tylko remisy. Obiekt ma ten sam interfejs co BaselineRouting i można go podać jako baseline.
+    """
+    def __init__(self, G_full, N, k=3):
+        self.topology = Topology.from_networkx(G_full)
+        self.keys = self.topology.keys
+        self.k = k
+        self.fallbacks = 0
+        demands, self.total_flow = self.topology.group_demands(N)
+        edge_id = {}
+        for e, (u, v) in enumerate(self.topology._ends):
+            edge_id[u, v] = edge_id[v, u] = e
+        nodes = self.topology.nodes
+        position = self.topology.position
+
+        # Dla każdej pary: (src, dst, flow, lista (maska, numer kandydatki) w kolejności kosztu);
+        # wiersz macierzy incidence to krawędzie ścieżki kandydującej
+        self.pairs = []
+        rows, cols = [], []
+        num_candidates = 0
+        for src, (dsts, flows) in demands.items():
+            for dst, flow in zip(dsts.tolist(), flows.tolist()):
+                if dst == src or not flow:
+                    continue
+                try:
+                    paths = list(islice(nx.shortest_simple_paths(G_full, nodes[src], nodes[dst], weight='cost'), k))
+                except nx.NetworkXNoPath:
+                    raise ValueError(f"Brak ścieżki {nodes[src]} -> {nodes[dst]} w pełnym grafie")
+                candidates = []
+                for path in paths:
+                    edges = [edge_id[position[a], position[b]] for a, b in zip(path, path[1:])]
+                    candidates.append((sum(1 << e for e in edges), num_candidates))
+                    rows.extend([num_candidates] * len(edges))
+                    cols.extend(edges)
+                    num_candidates += 1
+                self.pairs.append((src, dst, flow, candidates))
+        self.incidence = sparse.csr_matrix((np.ones(len(rows)), (rows, cols)),
+                                           shape=(num_candidates, self.topology.num_edges))
+
+    def state_loads(self, up, failed=None):
+        """
+        Wektor obciążeń krawędzi w stanie up (lista bool nad numerami krawędzi) albo None,
+        gdy któraś para z ruchem jest rozłączona. failed to maska bitowa awarii (failure_mask(up)).
+        """
+        if failed is None:
+            failed = failure_mask(up)
+        # Natężenie każdej pary trafia do jej pierwszej działającej kandydatki
+        selected = np.zeros(self.incidence.shape[0])
+        missed = {}
+        for src, dst, flow, candidates in self.pairs:
+            for mask, c in candidates:
+                if not mask & failed:
+                    selected[c] = flow
+                    break
+            else:
+                missed.setdefault(src, []).append((dst, flow))
+        loads = self.incidence.T @ selected
+
+        ends = self.topology._ends
+        for src, targets in missed.items():
+            self.fallbacks += len(targets)
+            parent_edge, _ = self.topology.shortest_path_tree(src, up)
+            for dst, flow in targets:
+                if parent_edge[dst] < 0:
+                    return None
+                v = dst
+                while v != src:
+                    e = parent_edge[v]
+                    loads[e] += flow
+                    v = ends[e][0] + ends[e][1] - v
+        return loads
+
 def compute_delay(G, flow_on_edge, total_flow, m):
     """
     Oblicza średnie opóźnienie T wg wzoru:
@@ -125,56 +729,1013 @@ def compute_delay(G, flow_on_edge, total_flow, m):
         delay_sum += a_e / (capacity_in_packets - a_e)
     return delay_sum / total_flow
 
+def compute_delay_batch(loads, capacity, total_flow, m, up=None, per_edge=False):
+    """
+    Wektorowa wersja compute_delay dla wielu stanów naraz.
+    loads to macierz obciążeń a(e) (stany x krawędzie), capacity - wektor przepustowości c(e) [bit/s],
+    total_flow - całkowity ruch (liczba albo wektor, po jednym na stan), up - maska działających
+    krawędzi (None = wszystkie). Argumenty są rozgłaszane (broadcasting) po ostatniej osi - krawędziach,
+    więc np. capacity może być też macierzą wielu wektorów przepustowości.
+
+    Uszkodzone krawędzie są pomijane, a stan z przeciążoną krawędzią (a(e) >= c(e)/m) lub zerowym
+    ruchem dostaje T = inf. Wynik to wektor T, a dla per_edge=True para (T, contributions), gdzie
+    contributions[..., e] = a(e) / (c(e)/m - a(e)) / total_flow to udział krawędzi w T
+    (inf dla krawędzi przeciążonych, 0 dla uszkodzonych).
+    """
+    loads = np.asarray(loads, dtype=float)
+    capacity_in_packets = np.asarray(capacity, dtype=float) / m
+    total_flow = np.asarray(total_flow, dtype=float)
+    up = np.ones(loads.shape[-1], dtype=bool) if up is None else np.asarray(up, dtype=bool)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        overloaded = (loads >= capacity_in_packets) & up
+        terms = np.where(up, loads / (capacity_in_packets - loads), 0.0)
+        # cumsum sumuje po kolei, tak jak pętla w compute_delay
+        T = np.cumsum(terms, axis=-1)[..., -1] / total_flow
+    T = np.where(overloaded.any(axis=-1) | (total_flow == 0), float('inf'), T)
+    if not per_edge:
+        return T
+    with np.errstate(divide='ignore', invalid='ignore'):
+        contributions = np.where(overloaded, float('inf'), terms / total_flow[..., None])
+    return T, contributions
+
+class FailureStateCache:
+    """
+    Ograniczona pamięć podręczna wyników oceny stanów awarii z usuwaniem najdawniej używanych (LRU).
+    Kluczem jest maska bitowa uszkodzonych krawędzi (failure_mask), wartością krotka
+    (flows, total_flow, T); dla stanów bez trasowania (None, None, inf).
+    Wpisy są poprawne tylko dla jednego zestawu (G_full, N, m, mode) - dla innych danych
+    należy użyć nowej instancji.
+    Liczniki hits i misses pozwalają ocenić skuteczność pamięci.
+    """
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, mask):
+        """Zwraca zapamiętany wynik dla maski albo None (liczone jako chybienie)."""
+        result = self._entries.get(mask)
+        if result is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(mask)
+        self.hits += 1
+        return result
+
+    def put(self, mask, result):
+        """Zapamiętuje wynik, usuwając najdawniej używany wpis po przekroczeniu maxsize."""
+        self._entries[mask] = result
+        self._entries.move_to_end(mask)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+def failure_mask(up):
+    """
+    Pakuje stany krawędzi (sekwencja bool, True = działa) w maskę bitową awarii:
+    bit e jest ustawiony, gdy krawędź e nie działa.
+    """
+    mask = 0
+    for e, edge_up in enumerate(up):
+        if not edge_up:
+            mask |= 1 << e
+    return mask
+
+def component_labels(nodes, edges):
+    """
+    Etykietuje spójne składowe grafu metodą union-find (z kompresją ścieżek przez połowienie).
+    Zwraca słownik wierzchołek -> etykieta; dwa wierzchołki są połączone ścieżką
+    wtedy i tylko wtedy, gdy mają tę samą etykietę.
+    """
+    parent = {v: v for v in nodes}
+
+    def find(v):
+        while parent[v] != v:
+            parent[v] = parent[parent[v]]
+            v = parent[v]
+        return v
+
+    for u, v in edges:
+        ru, rv = find(u), find(v)
+        if ru != rv:
+            parent[rv] = ru
+    return {v: find(v) for v in nodes}
+
+def component_labels_batch(num_nodes, edges, states):
+    """
+    Wektorowy union-find dla wielu stanów naraz.
+    edges to lista krawędzi (u, v) o wierzchołkach numerowanych 0..num_nodes-1,
+    states to macierz bool (stany x krawędzie) działających krawędzi.
+    Krawędzie łączone są po kolei jednocześnie we wszystkich stanach; etykietą składowej
+    jest jej najmniejszy wierzchołek.
+    Zwraca macierz etykiet (stany x wierzchołki).
+    """
+    rows = np.arange(len(states))
+    parent = np.tile(np.arange(num_nodes), (len(states), 1))
+
+    def find(x):
+        while True:
+            px = parent[rows, x]
+            if (px == x).all():
+                return x
+            x = px
+
+    for e, (u, v) in enumerate(edges):
+        ru = find(np.full(len(states), u))
+        rv = find(np.full(len(states), v))
+        join = states[:, e] & (ru != rv)
+        parent[rows[join], np.maximum(ru, rv)[join]] = np.minimum(ru, rv)[join]
+    # Przeskakiwanie wskaźników aż każdy wierzchołek wskazuje korzeń
+    while True:
+        grandparent = parent[rows[:, None], parent]
+        if (grandparent == parent).all():
+            return parent
+        parent = grandparent
+
+def demands_connected(G_full, N, states):
+    """
+    Dla macierzy stanów krawędzi G_full (stany x krawędzie) sprawdza, czy w każdym stanie
+    wszystkie pary z ruchem są połączone - porównując etykiety składowych z component_labels_batch.
+    Zwraca wektor bool.
+    """
+    topology = Topology.from_networkx(G_full)
+    labels = component_labels_batch(topology.num_nodes, topology.edges.tolist(), states)
+    demands, _ = topology.group_demands(N)
+    connected = np.ones(len(states), dtype=bool)
+    for src, (dsts, _) in demands.items():
+        connected &= (labels[:, dsts] == labels[:, [src]]).all(axis=1)
+    return connected
+
+class CutSetFilter:
+    """
+    Odrzucanie z góry stanów, w których trasowanie na pewno jest niemożliwe.
+    Raz, na pełnym grafie, wyznaczane są mosty i minimalne zbiory rozcinające
+    o co najwyżej max_size krawędziach, które rozdzielają jakąś parę z ruchem z N - np. dwie krawędzie
+    wierzchołka stopnia 2 albo trzy krawędzie łączące cykl 4-wierzchołkowy z resztą grafu z create_graph.
+    Każdy zbiór zapisany jest jako maska bitowa (numeracja jak w G_full.edges()), więc test stanu
+    to kilka operacji na maskach zamiast union-find i trasowania.
+    Licznik skipped podaje liczbę ocen pominiętych dzięki filtrowi.
+    """
+    def __init__(self, G_full, N, max_size=3):
+        topology = Topology.from_networkx(G_full)
+        demands, _ = topology.group_demands(N)
+        edges = topology.edges.tolist()
+        self.skipped = 0
+        self.cuts = []
+
+        def separates(removed):
+            labels = component_labels(range(topology.num_nodes),
+                                      [edge for e, edge in enumerate(edges) if e not in removed])
+            return any(labels[src] != labels[dst] for src, (dsts, _) in demands.items() for dst in dsts.tolist())
+
+        # Mniejsze zbiory najpierw, a nadzbiory znalezionych cięć nie są minimalne
+        for size in range(1, max_size + 1):
+            for removed in combinations(range(len(edges)), size):
+                mask = sum(1 << e for e in removed)
+                if any(cut & mask == cut for cut in self.cuts):
+                    continue
+                if separates(set(removed)):
+                    self.cuts.append(mask)
+        self._cut_edges = [np.array([e for e in range(len(edges)) if cut >> e & 1]) for cut in self.cuts]
+
+    def rejects(self, failed):
+        """Czy maska awarii failed (failure_mask) zawiera cały któryś zbiór rozcinający; zlicza pominięcia."""
+        for cut in self.cuts:
+            if cut & failed == cut:
+                self.skipped += 1
+                return True
+        return False
+
+    def rejects_batch(self, states):
+        """Wektor bool dla macierzy stanów (stany x krawędzie): True, gdy stan zawiera uszkodzony zbiór rozcinający."""
+        rejected = np.zeros(len(states), dtype=bool)
+        for cut_edges in self._cut_edges:
+            rejected |= ~states[:, cut_edges].any(axis=1)
+        self.skipped += int(rejected.sum())
+        return rejected
+
+def evaluate_graph(G_oper, N, m, mode='pair', baseline=None):
+    """
+    Ocenia jeden operacyjny graf: sprawdza (union-find), czy dla każdej pary z ruchem istnieje ścieżka,
+    a następnie liczy przepływy i opóźnienie T.
+    Zwraca (flows, total_flow, T) albo (None, None, inf), gdy trasowanie nie jest możliwe.
+    """
+    labels = component_labels(G_oper.nodes, G_oper.edges())
+    for src, dsts, _ in traffic_rows(N):
+        for dst in dsts:
+            if labels[src] != labels[dst]:
+                return None, None, float('inf')
+    flows, total_flow = compute_routing_flows(G_oper, N, mode, baseline)
+    if flows is None:
+        return None, None, float('inf')
+    return flows, total_flow, compute_delay(G_oper, flows, total_flow, m)
+
 FUN_GRAPH_MAX = 0
 FUN_FLOWS = 0
 FUN_GRAPH_G = 0
-def simulate_reliability(G_full, N, p, T_max, m, iterations=MC_ITER):
+def simulate_reliability(G_full, N, p, T_max, m, iterations=MC_ITER, mode='pair', cache=None, baseline=None,
+                         cut_filter=None, importance=False):
     global FUN_GRAPH_G, FUN_GRAPH_MAX, FUN_FLOWS
     """
     Symuluje niezawodność sieci metodą Monte Carlo.
     Dla każdej iteracji:
-      - Tworzy operacyjny podgraf G_oper, w którym każda krawędź działa z prawdopodobieństwem p.
+      - Tworzy operacyjny podgraf G_oper, w którym każda krawędź działa z prawdopodobieństwem p
+        (jedna liczba albo wektor niezawodności krawędzi, zob. edge_reliability).
       - Sprawdza, czy dla każdej pary (src, dst) z ruchem istnieje ścieżka.
-      - Jeśli tak, oblicza dynamiczne przepływy i opóźnienie T.
+      - Jeśli tak, oblicza dynamiczne przepływy (trybem mode, jak w compute_routing_flows) i opóźnienie T.
       - Iteracja jest sukcesem, jeśli T < T_max.
+    Z podaną pamięcią cache (FailureStateCache) stany awarii, które już wystąpiły,
+    nie są ponownie trasowane, a z baseline (BaselineRouting albo FastReroute) trasowanie jest przyrostowe.
+    Z cut_filter (CutSetFilter) stany z uszkodzonym mostem lub małym zbiorem rozcinającym odrzucane są
+    testem maski, bez sprawdzania spójności i trasowania.
       
     Zwraca stosunek sukcesów do liczby iteracji, w których trasowanie było możliwe.
+    Z importance=True zwraca (niezawodność, birnbaum, reliability_down) - miary ważności krawędzi
+    policzone z tych samych próbek (zob. edge_importance).
     """
     success = 0
     valid_iterations = 0
+    num_edges = G_full.number_of_edges()
+    p_edge = np.broadcast_to(np.asarray(p, dtype=float), num_edges).tolist()
+    states, valid, succeeded = [], [], []
     for _ in range(iterations):
-        # Losujemy operacyjny graf: każda krawędź działa z prawdopodobieństwem p.
-        G_oper = nx.Graph()
-        G_oper.add_nodes_from(G_full.nodes)
-        for u, v, attr in G_full.edges(data=True):
-            if random.random() <= p:
-                G_oper.add_edge(u, v, **attr)
-        # Sprawdzamy, czy dla wszystkich par z ruchem istnieje ścieżka
-        ok = True
-        for (src, dst), flow in N.items():
-            if flow > 0:
-                if not nx.has_path(G_oper, src, dst):
-                    ok = False
-                    break
-        flows, total_flow = compute_routing_flows(G_oper, N)
-        if flows is None:
-            continue
-        if not ok:
-            plot_graph(G_oper, flows)
+        # Losujemy stany krawędzi: każda krawędź działa z prawdopodobieństwem p.
+        up = [random.random() <= p_e for p_e in p_edge]
+        if importance:
+            states.append(up)
+            valid.append(False)
+            succeeded.append(False)
+        cached = None
+        if cache is not None or cut_filter is not None:
+            mask = failure_mask(up)
+        if cut_filter is not None and cut_filter.rejects(mask):
             continue
-        T = compute_delay(G_oper, flows, total_flow, m)
-        valid_iterations += 1
-        if T < T_max:
-            if FUN_GRAPH_MAX < T:
+        if cache is not None:
+            cached = cache.get(mask)
+        if cached is None:
+            G_oper = operational_graph(G_full, up)
+            flows, total_flow, T = evaluate_graph(G_oper, N, m, mode, baseline)
+            if cache is not None:
+                cache.put(mask, (flows, total_flow, T))
+            # Trafienie w pamięci to stan już oceniony, więc maksimum sprawdzamy tylko tutaj
+            if flows is not None and FUN_GRAPH_MAX < T < T_max:
                 FUN_GRAPH_MAX = T
                 FUN_GRAPH_G = G_oper
                 FUN_FLOWS = flows
+        else:
+            flows, total_flow, T = cached
+        if flows is None:
+            continue
+        valid_iterations += 1
+        if T < T_max:
             success += 1
+        if importance:
+            valid[-1] = True
+            succeeded[-1] = T < T_max
+    reliability = success / valid_iterations if valid_iterations else 0
+    # print(f"sukcesy {success}, {valid_iterations}")
+    if importance:
+        states = np.array(states, dtype=bool).reshape(iterations, num_edges)
+        return (reliability,) + edge_importance(states, np.array(valid, dtype=bool), np.array(succeeded, dtype=bool))
+    return reliability
+
+def edge_importance(states, valid, success):
+    """
+    Miary ważności krawędzi z już wylosowanych próbek: macierzy stanów (iteracje x krawędzie),
+    wektora iteracji z możliwym trasowaniem valid i wektora sukcesów success (valid i T < T_max).
+    Dla każdej krawędzi e próbki dzielone są wg kolumny states[:, e], a niezawodność w każdej grupie
+    liczona jest tym samym estymatorem co w simulate_reliability:
+      - reliability_down[e]: niezawodność pod warunkiem, że krawędź e nie działa
+      - birnbaum[e]: ważność Birnbauma, R(e działa) - R(e nie działa)
+    Krawędź, dla której w grupie nie ma żadnej poprawnej iteracji, dostaje nan.
+    Zwraca (birnbaum, reliability_down) - wektory w kolejności krawędzi.
+    """
+    valid = valid.astype(float)
+    success = success.astype(float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        reliability_up = (success @ states) / (valid @ states)
+        reliability_down = (success @ ~states) / (valid @ ~states)
+    return reliability_up - reliability_down, reliability_down
+
+def draw_edge_states(num_edges, p, iterations, rng=None, groups=None):
+    """
+    Losuje stany krawędzi dla wszystkich iteracji naraz.
+    p to niezawodność krawędzi - jedna liczba albo wektor, po jednej wartości na krawędź (edge_reliability).
+    groups to opcjonalna lista grup wspólnego ryzyka (shared_risk_groups): par (numery krawędzi,
+    prawdopodobieństwo awarii grupy). Awaria grupy (np. przecięcie kanalizacji kablowej) wyłącza
+    naraz wszystkie jej krawędzie, niezależnie od ich własnych awarii; na stan losowanych jest więc
+    tylko num_edges + len(groups) liczb.
+    Zwraca macierz bool o wymiarach (iterations x num_edges), gdzie True oznacza, że krawędź działa.
+
+    Bez rng liczby losowe pochodzą z globalnego modułu random, pobierane w tej samej kolejności
+    co w simulate_reliability (iteracja po iteracji, krawędź po krawędzi), więc dla tego samego
+    ziarna stany są identyczne (losowania grup następują po losowaniach krawędzi).
+    Z rng (np.random.Generator) cała macierz losowana jest jednym wywołaniem.
+    """
+    size = iterations * num_edges
+    if rng is None:
+        draws = np.fromiter((random.random() for _ in range(size)), dtype=float, count=size)
+    else:
+        draws = rng.random(size)
+    states = draws.reshape(iterations, num_edges) <= p
+    if groups:
+        size = iterations * len(groups)
+        if rng is None:
+            draws = np.fromiter((random.random() for _ in range(size)), dtype=float, count=size)
+        else:
+            draws = rng.random(size)
+        members = np.zeros((len(groups), num_edges), dtype=int)
+        for g, (edges, _) in enumerate(groups):
+            members[g, edges] = 1
+        group_down = draws.reshape(iterations, len(groups)) < [prob for _, prob in groups]
+        states &= (group_down @ members) == 0
+    return states
+
+def edge_reliability(G_full, p_dict, default=EDGE_RELIABILITY):
+    """
+    Wektor niezawodności krawędzi w kolejności G_full.edges() ze słownika p_dict
+    (klucz - uporządkowana krotka (u, v), jak p_dict_original w stare/simulationv2.py).
+    Krawędzie spoza słownika dostają default.
+    """
+    return np.array([p_dict.get(tuple(sorted((u, v))), default) for u, v in G_full.edges()], dtype=float)
+
+def shared_risk_groups(G_full, groups):
+    """
+    Zamienia grupy wspólnego ryzyka podane jako pary (lista krawędzi (u, v), prawdopodobieństwo awarii)
+    na postać przyjmowaną przez draw_edge_states: (tablica numerów krawędzi w G_full.edges(), prawdopodobieństwo).
+    """
+    index = {tuple(sorted((u, v))): e for e, (u, v) in enumerate(G_full.edges())}
+    return [(np.array([index[tuple(sorted(edge))] for edge in edges], dtype=int), prob) for edges, prob in groups]
+
+def operational_graph(G_full, up):
+    """
+    Buduje operacyjny podgraf G_oper z krawędziami G_full, dla których up[e] jest prawdą
+    (e to numer krawędzi w kolejności G_full.edges()).
+    Kolejność dodawania krawędzi jest taka sama jak w simulate_reliability, dzięki czemu
+    wyszukiwanie ścieżek rozstrzyga remisy identycznie.
+    """
+    G_oper = nx.Graph()
+    G_oper.add_nodes_from(G_full.nodes)
+    for (u, v, attr), edge_up in zip(G_full.edges(data=True), up):
+        if edge_up:
+            G_oper.add_edge(u, v, **attr)
+    return G_oper
+
+def _route_states(G_full, N, states, mode='pair', baseline=None, cut_filter=None):
+    """
+    Trasuje każdy wiersz macierzy stanów (trybem mode, jak w compute_routing_flows).
+    Stany, w których któraś para z ruchem jest rozłączona (demands_connected), są pomijane bez trasowania;
+    z cut_filter (CutSetFilter) stany z uszkodzonym zbiorem rozcinającym odrzucane są jeszcze przed union-find.
+    W trybie 'tree' i z baseline stany trasowane są bezpośrednio na Topology, bez budowania nx.Graph.
+    Zwraca macierz obciążeń (stany x krawędzie), wektor całkowitego ruchu, wektor bool
+    stanów z możliwym trasowaniem oraz listę wyników (flows, total_flow) compute_routing_flows.
+    """
+    keys = [tuple(sorted((u, v))) for u, v in G_full.edges()]
+    loads = np.zeros(states.shape, dtype=float)
+    total = np.zeros(len(states), dtype=float)
+    routable = np.zeros(len(states), dtype=bool)
+    if cut_filter is None:
+        connected = demands_connected(G_full, N, states)
+    else:
+        connected = ~cut_filter.rejects_batch(states)
+        connected[connected] = demands_connected(G_full, N, states[connected])
+    if baseline is not None:
+        total_flow = baseline.total_flow
+    elif mode == 'tree':
+        topology = Topology.from_networkx(G_full)
+        demands, total_flow = topology.group_demands(N)
+    routings = []
+    for k, up in enumerate(states):
+        if not connected[k]:
+            routings.append((None, None))
+            continue
+        if baseline is not None or mode == 'tree':
+            up = up.tolist()
+            state_loads = baseline.state_loads(up) if baseline is not None else topology.route(demands, up)
+            if state_loads is None:
+                routings.append((None, None))
+                continue
+            flows = {key: a for key, a, edge_up in zip(keys, state_loads.tolist(), up) if edge_up}
+        else:
+            flows, total_flow = compute_routing_flows(operational_graph(G_full, up), N, mode)
+        routings.append((flows, total_flow))
+        if flows is None:
+            continue
+        routable[k] = True
+        total[k] = total_flow
+        loads[k] = [flows.get(key, 0) for key in keys]
+    return loads, total, routable, routings
+
+def _unique_states(states):
+    """Zwraca różne wiersze macierzy stanów oraz indeksy odtwarzające z nich oryginalną macierz."""
+    packed = np.packbits(states, axis=1)
+    _, first, inverse = np.unique(packed, axis=0, return_index=True, return_inverse=True)
+    return states[first], inverse.reshape(-1)
+
+def evaluate_states(G_full, N, states, m, mode='pair', cache=None, baseline=None, cut_filter=None):
+    """
+    Ocenia macierz stanów krawędzi (iteracje x krawędzie) zwróconą przez draw_edge_states.
+    Każdy różny wiersz jest trasowany tylko raz (trybem mode, jak w compute_routing_flows),
+    a opóźnienia liczone są dla wszystkich stanów naraz. Spójność par z ruchem sprawdzana jest
+    wektorowo (demands_connected), ale w trybie 'pair' każdy różny stan spójny nadal trasowany jest
+    przez nx.Graph i nx.shortest_path dla każdej pary.
+    Z podaną pamięcią cache (FailureStateCache) pomijane są stany ocenione we wcześniejszych wywołaniach,
+    a z baseline (BaselineRouting albo FastReroute) trasowanie jest przyrostowe.
+    Z cut_filter (CutSetFilter) stany z uszkodzonym zbiorem rozcinającym odrzucane są bez trasowania.
+
+    Zwraca:
+      - valid: wektor bool, True gdy w danym stanie istnieje ścieżka dla każdej pary z ruchem
+      - T: wektor opóźnień (nieskończoność dla stanów niepoprawnych lub przeciążonych)
+    """
+    capacity = np.array([attr['capacity'] for _, _, attr in G_full.edges(data=True)], dtype=float)
+
+    # Identyczne wiersze (np. stan bez awarii) trasujemy tylko raz
+    unique_states, inverse = _unique_states(states)
+    valid = np.zeros(len(unique_states), dtype=bool)
+    T = np.full(len(unique_states), float('inf'))
+
+    misses = []
+    for k, up in enumerate(unique_states):
+        cached = cache.get(failure_mask(up)) if cache is not None else None
+        if cached is None:
+            misses.append(k)
+        else:
+            valid[k] = cached[0] is not None
+            T[k] = cached[2]
+
+    miss_states = unique_states[misses]
+    loads, total, routable, routings = _route_states(G_full, N, miss_states, mode, baseline, cut_filter)
+    T_miss = compute_delay_batch(loads, capacity, total, m, miss_states)
+    T_miss[~routable] = float('inf')
+    valid[misses] = routable
+    T[misses] = T_miss
+    if cache is not None:
+        for up, (flows, total_flow), T_k in zip(miss_states, routings, T_miss.tolist()):
+            cache.put(failure_mask(up), (flows, total_flow, T_k))
+    return valid[inverse], T[inverse]
+
+def simulate_reliability_batch(G_full, N, p, T_max, m, iterations=MC_ITER, rng=None, mode='pair', cache=None, baseline=None,
+                               cut_filter=None, groups=None, importance=False):
+    """
+    Wektorowa wersja simulate_reliability.
+    Losuje stany wszystkich krawędzi dla wszystkich iteracji jako jedną macierz (draw_edge_states -
+    p może być wektorem niezawodności krawędzi, a groups listą grup wspólnego ryzyka),
+    a następnie ocenia ją funkcją evaluate_states.
+
+    Zwraca ten sam estymator co simulate_reliability: stosunek sukcesów (T < T_max)
+    do liczby iteracji, w których trasowanie było możliwe. Bez rng wynik jest identyczny
+    z simulate_reliability dla tego samego ziarna modułu random.
+
+    W domyślnym trybie 'pair' zysk czasu względem simulate_reliability daje tylko jednokrotna ocena
+    powtarzających się stanów i pomijanie stanów rozspójnionych bez trasowania - przy małym p, gdy
+    stany rzadko się powtarzają, obie funkcje działają podobnie długo. Szybkie trasowanie stanów
+    (bez networkx) daje tryb 'tree' albo baseline (BaselineRouting, FastReroute).
+    Z importance=True zwraca (niezawodność, birnbaum, reliability_down), jak simulate_reliability.
+    """
+    states = draw_edge_states(G_full.number_of_edges(), p, iterations, rng, groups)
+    valid, T = evaluate_states(G_full, N, states, m, mode, cache, baseline, cut_filter)
+    valid_iterations = int(valid.sum())
+    success = int((valid & (T < T_max)).sum())
+    reliability = success / valid_iterations if valid_iterations else 0
+    if importance:
+        return (reliability,) + edge_importance(states, valid, valid & (T < T_max))
+    return reliability
+
+def reliability_bounds(G_full, N, p, T_max, m, max_failures=3, mode='pair', baseline=None):
+    """
+    Ograniczenia niezawodności przez przeglądanie stanów awarii w kolejności malejącego
+    prawdopodobieństwa (dla p >= 0.5): najpierw stan bez awarii, potem wszystkie stany
+    z 1, 2, ..., max_failures uszkodzonymi krawędziami. Każdy stan oceniany jest tym samym
+    kryterium co w simulate_reliability, z wagą p^(E-k) * (1-p)^k.
+
+    Szacowana wielkość to ta sama co w simulate_reliability: P(T < T_max | trasowanie możliwe).
+    Nieprzejrzana masa prawdopodobieństwa R może należeć do sukcesów albo porażek, więc przy
+    masie sukcesów S i porażek F (stanów z możliwym trasowaniem) gwarantowane są granice
+    S / (S + F + R) <= niezawodność <= (S + R) / (S + F + R).
+
+    Zwraca (dolna granica, górna granica).
+    """
+    num_edges = G_full.number_of_edges()
+    q = 1 - p
+    success_mass = 0.0
+    failure_mass = 0.0
+    enumerated_mass = 0.0
+    for k in range(min(max_failures, num_edges) + 1):
+        combos = list(combinations(range(num_edges), k))
+        states = np.ones((len(combos), num_edges), dtype=bool)
+        for row, failed in enumerate(combos):
+            states[row, list(failed)] = False
+        valid, T = evaluate_states(G_full, N, states, m, mode, baseline=baseline)
+        prob = p ** (num_edges - k) * q ** k
+        success = int((valid & (T < T_max)).sum())
+        success_mass += prob * success
+        failure_mass += prob * (int(valid.sum()) - success)
+        enumerated_mass += prob * len(combos)
+
+    remaining = max(0.0, 1.0 - enumerated_mass)
+    denominator = success_mass + failure_mass + remaining
+    if denominator == 0:
+        return 0, 0
+    return success_mass / denominator, (success_mass + remaining) / denominator
+
+def _estimate_summary(estimate, variance):
+    """
+    Zwraca (estymata, błąd standardowy, efektywna liczba próbek). Efektywna liczba próbek to liczba
+    losowań zwykłego Monte Carlo, które dałyby tę samą wariancję: estymata * (1 - estymata) / wariancja.
+    """
+    if variance <= 0:
+        return estimate, 0.0, float('inf')
+    return estimate, variance ** 0.5, estimate * (1 - estimate) / variance
+
+def simulate_reliability_stratified(G_full, N, p, T_max, m, iterations=MC_ITER, rng=None,
+                                    mode='pair', baseline=None, min_weight=1e-12):
+    """
+    Niezawodność metodą losowania warstwowego wg liczby uszkodzonych krawędzi k.
+    Warstwa k ma dokładną wagę dwumianową C(E, k) * p^(E-k) * (1-p)^k i dostaje proporcjonalną
+    liczbę iteracji (co najmniej 2); w warstwie losowany jest jednostajnie zbiór k uszkodzonych krawędzi.
+    Warstwy, w których stanów jest nie więcej niż przydzielonych iteracji (np. k = 0), są przeglądane
+    w całości i nie wnoszą wariancji. Warstwy o wadze poniżej min_weight są pomijane.
+
+    Szacowana jest ta sama wielkość co w simulate_reliability (estymator ilorazowy), a błąd
+    standardowy liczony jest metodą delta.
+    Zwraca (estymata, błąd standardowy, efektywna liczba próbek).
+    """
+    if rng is None:
+        rng = np.random.default_rng(random.getrandbits(64))
+    num_edges = G_full.number_of_edges()
+    q = 1 - p
+
+    strata = []
+    for k in range(num_edges + 1):
+        weight = comb(num_edges, k) * p ** (num_edges - k) * q ** k
+        if weight < min_weight:
+            continue
+        n = max(2, round(weight * iterations))
+        exact = comb(num_edges, k) <= n
+        if exact:
+            failed = np.array(list(combinations(range(num_edges), k)), dtype=int).reshape(comb(num_edges, k), k)
+        else:
+            failed = rng.random((n, num_edges)).argsort(axis=1)[:, :k]
+        states = np.ones((len(failed), num_edges), dtype=bool)
+        states[np.arange(len(failed))[:, None], failed] = False
+        valid, T = evaluate_states(G_full, N, states, m, mode, baseline=baseline)
+        strata.append((weight, (valid & (T < T_max)).astype(float), valid.astype(float), exact))
+
+    numerator = sum(w * x.mean() for w, x, v, _ in strata)
+    denominator = sum(w * v.mean() for w, x, v, _ in strata)
+    if denominator == 0:
+        return 0, 0.0, 0.0
+    estimate = float(numerator / denominator)
+    variance = sum(w ** 2 * np.var(x - estimate * v, ddof=1) / len(x)
+                   for w, x, v, exact in strata if not exact) / denominator ** 2
+    return _estimate_summary(estimate, float(variance))
+
+def simulate_reliability_importance(G_full, N, p, T_max, m, iterations=MC_ITER, failure_prob=None, rng=None,
+                                    mode='pair', baseline=None, target_failures=None):
+    """
+    Niezawodność metodą losowania ważonego (importance sampling).
+    Krawędzie psują się z podwyższonym prawdopodobieństwem failure_prob, domyślnie dobranym tak, żeby
+    średnia liczba awarii na iterację wynosiła target_failures: failure_prob = min(0.5, target_failures / E),
+    przy domyślnym target_failures = E * (1-p) + 1, czyli o jedną awarię więcej niż przy p.
+    Zysk jest duży, gdy awarie są rzadkie (p bliskie 1); gdy stanów z awariami i tak jest dużo
+    (np. p = EDGE_RELIABILITY), efektywna liczba próbek może być nieco mniejsza niż w zwykłym Monte Carlo.
+    Każda iteracja z f uszkodzonymi krawędziami dostaje wagę - iloraz wiarygodności
+    ((1-p) / failure_prob)^f * (p / (1-failure_prob))^(E-f).
+
+    Szacowana jest ta sama wielkość co w simulate_reliability (ważony estymator ilorazowy), a błąd
+    standardowy liczony jest metodą delta.
+    Zwraca (estymata, błąd standardowy, efektywna liczba próbek).
+    """
+    num_edges = G_full.number_of_edges()
+    q = 1 - p
+    if failure_prob is None:
+        if target_failures is None:
+            target_failures = num_edges * q + 1
+        failure_prob = min(0.5, target_failures / num_edges)
+
+    states = draw_edge_states(num_edges, 1 - failure_prob, iterations, rng)
+    failed = (~states).sum(axis=1)
+    ratio = (q / failure_prob) ** failed * (p / (1 - failure_prob)) ** (num_edges - failed)
+    valid, T = evaluate_states(G_full, N, states, m, mode, baseline=baseline)
+    success = valid & (T < T_max)
+
+    denominator = (ratio * valid).sum()
+    if denominator == 0:
+        return 0, 0.0, 0.0
+    estimate = (ratio * success).sum() / denominator
+    variance = ((ratio * (success - estimate * valid)) ** 2).sum() / denominator ** 2
+    return _estimate_summary(float(estimate), float(variance))
+
+def _reliability_chunk(args):
+    """
+    Jedna porcja simulate_reliability_parallel (funkcja modułu, żeby dało się ją przesłać do procesu).
+    Zwraca (liczba sukcesów, liczba iteracji z możliwym trasowaniem).
+    """
+    G_full, N, p, T_max, m, iterations, seed_seq, mode, baseline, groups = args
+    states = draw_edge_states(G_full.number_of_edges(), p, iterations, np.random.default_rng(seed_seq), groups)
+    valid, T = evaluate_states(G_full, N, states, m, mode, baseline=baseline)
+    return int((valid & (T < T_max)).sum()), int(valid.sum())
+
+def simulate_reliability_parallel(G_full, N, p, T_max, m, iterations=MC_ITER, seed=0, workers=None,
+                                  chunk_size=MC_CHUNK, mode='pair', baseline=None, groups=None):
+    """
+    Równoległa wersja simulate_reliability_batch na puli procesów.
+    Iteracje dzielone są na porcje po chunk_size; porcja i losuje z własnego, niezależnego strumienia
+    np.random.SeedSequence(seed).spawn(...)[i], a liczby sukcesów i poprawnych iteracji są sumowane.
+    Podział na porcje nie zależy od liczby procesów, więc wynik dla danego seed jest taki sam
+    dla dowolnego workers (None = wszystkie rdzenie, 1 = bez puli procesów).
+
+    Zwraca ten sam estymator co simulate_reliability.
+    """
+    sizes = [chunk_size] * (iterations // chunk_size)
+    if iterations % chunk_size:
+        sizes.append(iterations % chunk_size)
+    streams = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [(G_full, N, p, T_max, m, size, stream, mode, baseline, groups) for size, stream in zip(sizes, streams)]
+
+    if workers == 1:
+        results = [_reliability_chunk(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_reliability_chunk, tasks))
+
+    success = sum(r[0] for r in results)
+    valid_iterations = sum(r[1] for r in results)
     if valid_iterations == 0:
         return 0
-    # print(f"sukcesy {success}, {valid_iterations}")
     return success / valid_iterations
 
+def simulate_availability(G_full, N, T_max, m, mtbf=EDGE_MTBF, mttr=EDGE_MTTR, years=1.0, rng=None, baseline=None):
+    """
+    Symulacja zdarzeniowa dostępności sieci w czasie.
+    Każda krawędź na przemian działa przez czas wykładniczy o średniej mtbf i jest naprawiana przez
+    czas wykładniczy o średniej mttr (w godzinach; liczby albo wektory, po jednej wartości na krawędź
+    w kolejności G_full.edges()). Zdarzenia awarii i napraw trzymane są w kopcu (heapq), a czas
+    przeskakuje od zdarzenia do zdarzenia - między zdarzeniami stan sieci się nie zmienia.
+    Po każdym zdarzeniu stan oceniany jest jak w simulate_reliability (T < T_max); trasowanie jest
+    przyrostowe względem baseline (domyślnie BaselineRouting dla G_full i N), a wynik dla danej maski
+    awarii jest zapamiętywany, bo te same stany powtarzają się wielokrotnie.
+
+    Zwraca:
+      - availability: ułamek czasu symulacji (years lat), w którym trasowanie jest możliwe i T < T_max
+      - outages: tablica długości kolejnych przerw w godzinach (przerwa trwająca na końcu symulacji
+                 jest ucięta do jej końca)
+    """
+    if rng is None:
+        rng = np.random.default_rng(random.getrandbits(64))
+    if baseline is None:
+        baseline = BaselineRouting(G_full, N)
+    num_edges = G_full.number_of_edges()
+    mtbf = np.broadcast_to(np.asarray(mtbf, dtype=float), num_edges).tolist()
+    mttr = np.broadcast_to(np.asarray(mttr, dtype=float), num_edges).tolist()
+    capacity = np.array([attr['capacity'] for _, _, attr in G_full.edges(data=True)], dtype=float)
+    horizon = years * HOURS_PER_YEAR
+
+    def state_ok(up, failed):
+        ok = evaluated.get(failed)
+        if ok is None:
+            loads = baseline.state_loads(up, failed)
+            ok = loads is not None and compute_delay_batch(loads, capacity, baseline.total_flow, m, up) < T_max
+            evaluated[failed] = bool(ok)
+        return ok
+
+    # Zdarzenie: (czas, numer krawędzi) - krawędź zmienia stan na przeciwny
+    events = [(rng.exponential(mtbf[e]), e) for e in range(num_edges)]
+    heapify(events)
+    up = [True] * num_edges
+    failed = 0
+    evaluated = {}
+    ok = state_ok(up, failed)
+    now = 0.0
+    good_time = 0.0
+    outage_start = None if ok else 0.0
+    outages = []
+    while events[0][0] < horizon:
+        t, e = heappop(events)
+        if ok:
+            good_time += t - now
+        now = t
+        up[e] = not up[e]
+        failed ^= 1 << e
+        heappush(events, (t + rng.exponential(mtbf[e] if up[e] else mttr[e]), e))
+        was_ok, ok = ok, state_ok(up, failed)
+        if was_ok and not ok:
+            outage_start = now
+        elif ok and not was_ok:
+            outages.append(now - outage_start)
+    if ok:
+        good_time += horizon - now
+    else:
+        outages.append(horizon - outage_start)
+    return good_time / horizon, np.array(outages)
+
+def _route_incidence(topology, pairs, up, mode='tree'):
+    """
+    Trasuje pary pairs (tablica par numerów wierzchołków w topologii, pary x 2) w stanie up trybem mode,
+    jak w compute_routing_flows: 'tree' - drzewami najkrótszych ścieżek, 'pair' - nx.shortest_path dla
+    każdej pary na grafie z działającymi krawędziami. Zwraca rzadką macierz incydencji CSR (pary x krawędzie;
+    1 gdy ścieżka pary używa krawędzi) oraz wektor bool osiągalności celów.
+    """
+    pairs = np.asarray(pairs, dtype=int).reshape(-1, 2)
+    rows = []
+    cols = []
+    reachable = np.zeros(len(pairs), dtype=bool)
+    ends = topology.edges.tolist()
+    if mode == 'pair':
+        G_oper = topology.to_networkx(up)
+        edge_id = {}
+        for e, (u, v) in enumerate(ends):
+            edge_id[u, v] = edge_id[v, u] = e
+        position, nodes = topology.position, topology.nodes
+        for r, (src, dst) in enumerate(pairs.tolist()):
+            try:
+                path = nx.shortest_path(G_oper, source=nodes[src], target=nodes[dst], weight='cost')
+            except nx.NetworkXNoPath:
+                continue
+            reachable[r] = True
+            for a, b in zip(path, path[1:]):
+                rows.append(r)
+                cols.append(edge_id[position[a], position[b]])
+        A = sparse.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(len(pairs), topology.num_edges))
+        return A, reachable
+    if mode != 'tree':
+        raise ValueError(f"Nieznany tryb trasowania: {mode}")
+    # Pary grupowane wg źródła; ścieżki wszystkich celów jednego drzewa przechodzone są naraz,
+    # krok w stronę korzenia na iterację
+    srcs, dsts = pairs.T
+    by_source = np.argsort(srcs, kind='stable')
+    sources, starts = np.unique(srcs[by_source], return_index=True)
+    other_end = topology.edges.sum(axis=1)
+    for src, r in zip(sources.tolist(), np.split(by_source, starts[1:])):
+        parent_edge = np.array(topology.shortest_path_tree(src, up)[0])
+        targets = dsts[r]
+        found = (parent_edge[targets] >= 0) | (targets == src)
+        reachable[r] = found
+        r, v = r[found], targets[found]
+        while len(v):
+            moving = v != src
+            r, v = r[moving], v[moving]
+            e = parent_edge[v]
+            rows.append(r)
+            cols.append(e)
+            v = other_end[e] - v
+    rows = np.concatenate(rows) if rows else np.zeros(0, dtype=int)
+    cols = np.concatenate(cols) if cols else np.zeros(0, dtype=int)
+    A = sparse.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(len(pairs), topology.num_edges))
+    return A, reachable
+
+def routing_incidence(G_full, N=None, up=None, pairs=None):
+    """
+    Macierz incydencji ścieżka-krawędź dla trasowania 'tree' w stanie up (maska bool nad krawędziami
+    G_full; None = wszystkie działają). Wiersze to pary (src, dst) z listy pairs; bez pairs - pary
+    z niezerowym ruchem w N, a bez N i pairs - wszystkie uporządkowane pary różnych wierzchołków.
+    Kolumny to krawędzie w kolejności G_full.edges(); A[r, e] = 1, gdy ścieżka pary r przechodzi
+    przez krawędź e. Obciążenia dla macierzy natężeń N2 to wtedy edge_loads(A, pair_demands(N2, pairs)),
+    o ile cały ruch N2 mieści się w pairs - do oceny wielu scenariuszy ruchu należy podać pairs
+    obejmujące je wszystkie (albo trasować wszystkie pary).
+
+    Zwraca (A, pairs): rzadką macierz CSR i listę par (src, dst) odpowiadających wierszom,
+    albo (None, pairs), jeśli któraś para jest rozłączona.
+    """
+    topology = Topology.from_networkx(G_full)
+    nodes = topology.nodes
+    if pairs is not None:
+        pairs = list(pairs)
+        positions = [(topology.position[src], topology.position[dst]) for src, dst in pairs]
+    elif N is not None:
+        demands, _ = topology.group_demands(N)
+        positions = np.concatenate([np.column_stack((np.full(len(dsts), src), dsts)) for src, (dsts, _) in demands.items()]
+                                   + [np.zeros((0, 2), dtype=int)])
+        pairs = [(nodes[src], nodes[dst]) for src, dst in positions.tolist()]
+    else:
+        src, dst = np.nonzero(~np.eye(topology.num_nodes, dtype=bool))
+        positions = np.column_stack((src, dst))
+        pairs = [(nodes[src], nodes[dst]) for src, dst in positions.tolist()]
+    A, reachable = _route_incidence(topology, positions, None if up is None else list(up))
+    if not reachable.all():
+        return None, pairs
+    return A, pairs
+
+def pair_demands(N, pairs):
+    """
+    Natężenia ruchu z N (dowolnego rodzaju, zob. traffic_rows) dla listy par (src, dst) bez powtórzeń -
+    wektor zgodny z wierszami macierzy z routing_incidence. Pary bez ruchu dostają 0.
+    Jeśli N ma niezerowy ruch dla pary spoza pairs, zgłaszany jest ValueError - taki ruch nie miałby
+    wiersza w macierzy incydencji i zostałby po cichu pominięty w obciążeniach.
+    """
+    if not pairs:
+        demands = np.zeros(0)
+    else:
+        src, dst = np.array(pairs).T
+        if hasattr(N, 'tocsr'):
+            demands = np.asarray(N.tocsr()[src, dst], dtype=float).ravel()
+        elif isinstance(N, np.ndarray):
+            demands = np.asarray(N[src, dst], dtype=float)
+        else:
+            demands = np.array([N.get(pair, 0) for pair in pairs], dtype=float)
+    demanded = sum(len(dsts) for _, dsts, _ in traffic_rows(N))
+    if demanded > (demands > 0).sum():
+        raise ValueError(f"N ma niezerowy ruch dla {demanded - (demands > 0).sum()} par spoza listy pairs")
+    return demands
+
+def edge_loads(A, demands):
+    """
+    Obciążenia krawędzi a(e) jako jeden iloczyn A.T @ demands.
+    demands to wektor natężeń par (wynik pair_demands) albo macierz (pary x scenariusze) - wtedy
+    wynikiem jest macierz (krawędzie x scenariusze) obciążeń dla wszystkich scenariuszy naraz.
+    """
+    return A.T @ demands
+
+def sweep_traffic(G_full, N_list, p, T_max, m, iterations=MC_ITER, rng=None, mode='pair'):
+    """
+    Niezawodność dla całej serii macierzy natężeń N_list (dowolnego rodzaju, zob. traffic_rows)
+    przy wspólnych liczbach losowych.
+    Stany awarii losowane są raz (jak w simulate_reliability_batch) i każdy różny stan trasowany
+    jest raz (trybem mode, jak w compute_routing_flows); trasy nie zależą od N, więc obciążenia dla
+    wszystkich macierzy to jeden iloczyn rzadkiej macierzy incydencji tras (pary x krawędzie)
+    z macierzą natężeń (edge_loads).
+
+    Zwraca listę niezawodności, po jednej dla każdej macierzy z N_list.
+    """
+    topology = Topology.from_networkx(G_full)
+    num_nodes = topology.num_nodes
+
+    # Para (src, dst) kodowana jest liczbą src * V + dst (numery w topologii); rzadka macierz natężeń D
+    # (macierze x pary) składana jest bezpośrednio z tablic wierszy group_demands
+    codes, scenarios, values = [np.zeros(0, dtype=int)], [np.zeros(0, dtype=int)], [np.zeros(0)]
+    for k, N in enumerate(N_list):
+        demands, _ = topology.group_demands(N)
+        for src, (dsts, flows) in demands.items():
+            codes.append(src * num_nodes + dsts)
+            scenarios.append(np.full(len(dsts), k))
+            values.append(flows)
+    pair_codes, columns = np.unique(np.concatenate(codes), return_inverse=True)
+    D = sparse.csr_matrix((np.concatenate(values), (np.concatenate(scenarios), columns.reshape(-1))),
+                          shape=(len(N_list), len(pair_codes)))
+    demanded = (D > 0).astype(float)
+    total = np.asarray(D.sum(axis=1)).ravel()
+    positions = np.column_stack(np.divmod(pair_codes, num_nodes))
+
+    states = draw_edge_states(topology.num_edges, p, iterations, rng)
+    unique_states, counts = np.unique(states, axis=0, return_counts=True)
+    success = np.zeros(len(N_list))
+    valid = np.zeros(len(N_list))
+    for up, c in zip(unique_states, counts):
+        A, reachable = _route_incidence(topology, positions, up.tolist(), mode)
+        ok = demanded @ ~reachable == 0
+        T = compute_delay_batch(edge_loads(A, D.T).T.toarray(), topology.capacity, total, m, up)
+        valid += c * ok
+        success += c * (ok & (T < T_max))
+    return [float(s / v) if v else 0 for s, v in zip(success, valid)]
+
+def sweep_capacity(G_full, N, capacities, p, T_max, m, iterations=MC_ITER, rng=None, mode='pair', baseline=None):
+    """
+    Niezawodność dla wielu wektorów przepustowości naraz przy wspólnych liczbach losowych.
+    capacities to macierz (punkty x krawędzie) przepustowości [bit/s] w kolejności G_full.edges().
+    Trasowanie i obciążenia nie zależą od przepustowości, więc każdy różny stan awarii trasowany
+    jest raz, a opóźnienia dla wszystkich wektorów przepustowości liczone są jednym wyrażeniem.
+    Funkcja nie zmienia żadnych zmiennych globalnych.
+
+    Zwraca listę niezawodności, po jednej dla każdego wiersza capacities.
+    """
+    capacities = np.asarray(capacities, dtype=float)
+    states = draw_edge_states(G_full.number_of_edges(), p, iterations, rng)
+    unique_states, inverse = _unique_states(states)
+    counts = np.bincount(inverse, minlength=len(unique_states))
+    loads, total, routable, _ = _route_states(G_full, N, unique_states, mode, baseline)
+
+    # Wymiary: (stany, punkty, krawędzie)
+    T = compute_delay_batch(loads[:, None, :], capacities[None, :, :], total[:, None], m, unique_states[:, None, :])
+    valid = counts[routable].sum()
+    if valid == 0:
+        return [0] * len(capacities)
+    success = (counts[routable, None] * (T[routable] < T_max)).sum(axis=0)
+    return [float(s / valid) for s in success]
+
+def greedy_edge_addition(G_full, N, p, T_max, m, steps, iterations=MC_ITER, rng=None,
+                         capacity=(CAPACITY_MIN + CAPACITY_MAX) // 2, cost=1):
+    """
+    Zachłanne dodawanie krawędzi: w każdym z steps kroków ocenia wszystkie brakujące krawędzie (u, v)
+    (bez pętli i duplikatów) o przepustowości capacity i koszcie cost i dodaje tę, która daje
+    największą niezawodność. Trasowanie jak w trybie 'tree' (Topology) - wyniki różnią się od
+    domyślnego trybu 'pair' w simulate_reliability, bo remisy kosztów rozstrzygane są inaczej.
+
+    Wszystkie kandydatki oceniane są na tych samych stanach (wspólne liczby losowe): macierz stanów
+    losowana jest raz dla num_edges + steps kolumn, a kolumna num_edges + k to stan krawędzi dodanej
+    w kroku k. Dla każdego różnego stanu raz liczone są drzewa najkrótszych ścieżek wszystkich źródeł
+    (shortest_path_trees). Spośród kandydatek o tej samej niezawodności (np. gdy na próbkach wynosi już 1)
+    wybierana jest ta o najmniejszym średnim opóźnieniu T w stanach z sukcesem.
+    Kandydatka (u, v) zmienia drzewo źródła tylko wtedy, gdy skraca drogę do u
+    albo v, albo przy równej odległości u (v) jest przetwarzany przed dotychczasowym poprzednikiem
+    v (u) - dotyczy to zarówno BFS, jak i Dijkstry z dowolnymi kosztami. Tylko takie drzewa są
+    przeliczane, a obciążenia łatane jak w BaselineRouting. Stany
+    rozspójnione przed dodaniem trasowane są tylko wtedy, gdy nowa krawędź łączy ich składowe.
+
+    Zwraca (added, reliability): listę dodanych krawędzi (u, v) oraz niezawodność po każdym kroku
+    (estymator jak w simulate_reliability, na tych samych próbkach). Gdy graf jest pełny,
+    listy są krótsze niż steps.
+    """
+    num_edges = G_full.number_of_edges()
+    states = draw_edge_states(num_edges + steps, p, iterations, rng)
+    topology = Topology.from_networkx(G_full)
+    demands, total_flow = topology.group_demands(N)
+    sources = list(demands)
+    added = []
+    curve = []
+    for step in range(steps):
+        E = topology.num_edges
+        unique_states, inverse = _unique_states(states[:, :E + 1])
+        counts = np.bincount(inverse, minlength=len(unique_states))
+        base_states = unique_states[:, :E]
+        new_up = unique_states[:, E]
+
+        # Drzewa bez nowej krawędzi. parent_position to pozycja (w kolejności przetwarzania)
+        # poprzednika wierzchołka w drzewie; num_nodes dla źródła i wierzchołków nieosiągalnych
+        trees, contributions = [], []
+        valid = np.ones(len(unique_states), dtype=bool)
+        parent_position = []
+        for src in sources:
+            tree = topology.shortest_path_trees(src, base_states)
+            loads, reachable = topology.source_loads_batch(src, demands[src], tree)
+            trees.append(tree)
+            contributions.append(loads)
+            valid &= reachable
+            parent_edge, position, _ = tree
+            has_parent = parent_edge >= 0
+            parent = np.where(has_parent, topology.edges[parent_edge].sum(axis=2) - np.arange(topology.num_nodes), 0)
+            parent_position.append(np.where(has_parent, np.take_along_axis(position, parent, axis=1),
+                                            topology.num_nodes))
+        base_loads = np.zeros((len(unique_states), E))
+        for loads in contributions:
+            base_loads += loads
+        base_T = np.where(valid, compute_delay_batch(base_loads, topology.capacity, total_flow, m, base_states),
+                          float('inf'))
+        labels = component_labels_batch(topology.num_nodes, topology.edges.tolist(), base_states)
+
+        best = None
+        existing = {tuple(sorted(edge)) for edge in topology._ends}
+        for u, v in combinations(range(topology.num_nodes), 2):
+            if (u, v) in existing:
+                continue
+            extended = Topology(topology.nodes, topology._ends + [(u, v)], np.append(topology.capacity, capacity),
+                                np.append(topology.cost, cost))
+            loads = np.zeros((len(unique_states), E + 1))
+            loads[:, :E] = base_loads
+            changed = np.zeros(len(unique_states), dtype=bool)
+            for i, src in enumerate(sources):
+                _, position, dist = trees[i]
+                du, dv = dist[:, u], dist[:, v]
+                with np.errstate(invalid='ignore'):
+                    affected = (np.isfinite(du) & np.isfinite(dv)
+                                & ((du + cost < dv) | (dv + cost < du)
+                                   | ((du + cost == dv) & (position[:, u] < parent_position[i][:, v]))
+                                   | ((dv + cost == du) & (position[:, v] < parent_position[i][:, u]))))
+                affected &= valid & new_up
+                if not affected.any():
+                    continue
+                rows = np.flatnonzero(affected)
+                loads[rows, :E] -= contributions[i][rows]
+                # Jak w BaselineRouting: drzewo, którego krawędzie działają, jest takie jak w pełnym grafie
+                full_loads = extended.source_loads(src, demands[src])
+                used = np.array(list(full_loads), dtype=int)
+                intact = unique_states[rows][:, used].all(axis=1)
+                loads[rows[intact][:, None], used] += np.array(list(full_loads.values()))
+                rows = rows[~intact]
+                if len(rows):
+                    tree = extended.shortest_path_trees(src, unique_states[rows])
+                    loads[rows] += extended.source_loads_batch(src, demands[src], tree)[0]
+                changed |= affected
+
+            # Stany rozspójnione, w których nowa krawędź łączy składowe
+            merged = np.where(labels == labels[:, [v]], labels[:, [u]], labels)
+            joined = ~valid & new_up
+            for src, (dsts, _) in demands.items():
+                joined &= (merged[:, dsts] == merged[:, [src]]).all(axis=1)
+            for k in np.flatnonzero(joined):
+                loads[k] = extended.route(demands, unique_states[k].tolist())
+
+            T = base_T.copy()
+            rows = np.flatnonzero(changed | joined)
+            T[rows] = compute_delay_batch(loads[rows], extended.capacity, total_flow, m, unique_states[rows])
+            success = T < T_max
+            valid_iterations = (counts * (valid | joined)).sum()
+            reliability = (counts * success).sum() / valid_iterations if valid_iterations else 0
+            # Przy równej niezawodności (np. gdy na próbkach wynosi już 1) decyduje mniejsze średnie T
+            # w stanach z sukcesem
+            mean_T = (counts * success * np.where(success, T, 0)).sum() / max((counts * success).sum(), 1)
+            if best is None or (reliability, -mean_T) > (best[0], -best[1]):
+                best = (float(reliability), float(mean_T), (u, v), extended)
+
+        if best is None:
+            break
+        reliability, _, (u, v), topology = best
+        added.append((topology.nodes[u], topology.nodes[v]))
+        curve.append(reliability)
+    return added, curve
+
 def plot_graph(G, flow_on_edge):
     """
     Rysuje graf przy użyciu matplotlib.
@@ -221,6 +1782,13 @@ def main():
     # Symulacja niezawodności (Monte Carlo)
     reliability = simulate_reliability(G, N, EDGE_RELIABILITY, T_MAX, PACKET_SIZE, iterations=MC_ITER)
     print(f"Oszacowana niezawodność sieci (T < T_MAX): {reliability:.4f}")
+
+    # Symulacja zdarzeniowa: awarie i naprawy krawędzi w czasie (MTBF/MTTR)
+    availability, outages = simulate_availability(G, N, T_MAX, PACKET_SIZE, years=10, rng=np.random.default_rng(42))
+    print(f"Dostępność w czasie (T < T_MAX, 10 lat): {availability:.4f}")
+    if len(outages):
+        print(f"Przerwy: {len(outages)}, średnio {outages.mean():.1f} h, "
+              f"mediana {np.median(outages):.1f} h, maksymalnie {outages.max():.1f} h")
     
     plot_graph(G, flows)
 
@@ -228,22 +1796,13 @@ def main():
     plot_graph(FUN_GRAPH_G, FUN_FLOWS)
 
     print("\nWykres niezawodności w zależności od macierzy natężeń:")
-    reliability_values = []
-    flow_scaling = []
-
     TEST_SIZE = 11
 
-    for t in range(TEST_SIZE):
-        for i in range(NUM_NODES):
-            for j in range(NUM_NODES):
-                N[(i, j)] += 0.2
-                if j == i:
-                    N[(i, j)] = 0
-
-        reliability = simulate_reliability(G, N, EDGE_RELIABILITY, T_MAX, PACKET_SIZE, iterations=MC_ITER)
-        reliability_values.append(reliability)
-        flow_scaling.append(t + 1)
-
+    # Macierz dla punktu t: każda wartość poza przekątną zwiększona o 0.2 * t
+    flow_scaling = [t + 1 for t in range(TEST_SIZE)]
+    N_list = [{(i, j): (flow + 0.2 * t if i != j else 0) for (i, j), flow in N.items()} for t in flow_scaling]
+    reliability_values = sweep_traffic(G, N_list, EDGE_RELIABILITY, T_MAX, PACKET_SIZE, iterations=MC_ITER)
+    for t, reliability in enumerate(reliability_values):
         print(f"i = {t}: Oszacowana niezawodność sieci (T < T_MAX): {reliability:.4f}")
 
     # Tworzenie wykresu
@@ -256,27 +1815,21 @@ def main():
     plt.legend()
     plt.savefig("macierz_natezen.png")
 
-    for i in range(NUM_NODES):
-            for j in range(NUM_NODES):
-                N[(i, j)] -= 0.2 * TEST_SIZE
-                if j == i:
-                    N[(i, j)] = 0
-    
     print("\nWykres niezawodności w zależności od przepustowości:")
 
-    global CAPACITY_MAX, CAPACITY_MIN
-    reliability_values = []
+    # Dla każdego punktu losujemy nowe przepustowości z zakresu zwiększanego o 5%
+    capacity_min, capacity_max = CAPACITY_MIN, CAPACITY_MAX
+    capacities = []
     capacity_scaling = []
-
     for t in range(TEST_SIZE):
-        CAPACITY_MIN = int(CAPACITY_MIN * 1.05)
-        CAPACITY_MAX = int(CAPACITY_MAX * 1.05)
-
-        G = create_graph()
-        reliability = simulate_reliability(G, N, EDGE_RELIABILITY, T_MAX, PACKET_SIZE, iterations=MC_ITER)
-        reliability_values.append(reliability)
+        capacity_min = int(capacity_min * 1.05)
+        capacity_max = int(capacity_max * 1.05)
+        G_scaled = create_graph(capacity_min, capacity_max)
+        capacities.append([attr['capacity'] for _, _, attr in G_scaled.edges(data=True)])
         capacity_scaling.append(1.05 ** (t + 1))
 
+    reliability_values = sweep_capacity(G, N, capacities, EDGE_RELIABILITY, T_MAX, PACKET_SIZE, iterations=MC_ITER)
+    for t, reliability in enumerate(reliability_values):
         print(f"i = {t}: Oszacowana niezawodność sieci (T < T_MAX): {reliability:.4f}")
 
     # Tworzenie wykresu
@@ -289,27 +1842,27 @@ def main():
     plt.legend()
     plt.savefig("przepustowosc.png")
 
-    CAPACITY_MIN = 600 * PACKET_SIZE
-    CAPACITY_MAX = 800 * PACKET_SIZE
-
     G = create_graph()
     added_edges = []
-    reliability_values = []
 
-    for i in range(TEST_SIZE):
-        cap = random.randint(CAPACITY_MIN, CAPACITY_MAX)
-        G.add_edge(random.randint(0, 19), random.randint(0, 19), capacity=cap, cost=1)
-        reliability = simulate_reliability(G, N, EDGE_RELIABILITY, T_MAX, PACKET_SIZE, iterations=MC_ITER)
+    # Zachłanny dobór: w każdym kroku dodajemy brakującą krawędź, która najbardziej zwiększa niezawodność.
+    # greedy_edge_addition ocenia kandydatki w trybie 'tree', a nie 'pair' jak powyższe eksperymenty,
+    # więc przy równych kosztach tras wartości nie są wprost porównywalne z poprzednimi wykresami
+    print("\nWykres niezawodności w zależności od liczby dodanych krawędzi (trasowanie 'tree'):")
+    capacity = (CAPACITY_MIN + CAPACITY_MAX) // 2
+    chosen_edges, reliability_values = greedy_edge_addition(G, N, EDGE_RELIABILITY, T_MAX, PACKET_SIZE, TEST_SIZE,
+                                                            iterations=MC_ITER, capacity=capacity)
+    for i, ((u, v), reliability) in enumerate(zip(chosen_edges, reliability_values)):
+        G.add_edge(u, v, capacity=capacity, cost=1)
         added_edges.append(i + 1)
-        reliability_values.append(reliability)
-        print(f"Liczba dodanych krawędzi: {i + 1}, Niezawodność: {reliability:.4f}")
+        print(f"Liczba dodanych krawędzi: {i + 1}, krawędź: ({u}, {v}), Niezawodność: {reliability:.4f}")
 
     # Tworzenie wykresu
     plt.figure(figsize=(10, 6))
     plt.plot(added_edges, reliability_values, marker='o', label="Niezawodność")
     plt.xlabel("Liczba dodanych krawędzi")
     plt.ylabel("Niezawodność sieci (T < T_MAX)")
-    plt.title("Niezawodność sieci w zależności od liczby dodanych krawędzi")
+    plt.title("Niezawodność sieci w zależności od liczby dodanych krawędzi (trasowanie 'tree')")
     plt.grid(True)
     plt.legend()
     plt.savefig("dodane_krawedzie.png")
@@ -0,0 +1,27 @@
+import unittest
+
+import networkx as nx
+import numpy as np
+
+from graf_symulacja import greedy_edge_addition, simulate_reliability_batch
+
+
+class GreedyEdgeAdditionTest(unittest.TestCase):
+    def test_weighted_tie_changes_tree(self):
+        # Adding (1, 3) with cost 2 gives 0 -> 1 -> 3 the same cost as 0 -> 2 -> 3, and Dijkstra
+        # processes 1 before 2, so the traffic leaves the 500 bit/s edge (0, 2)
+        G = nx.Graph()
+        for u, v, cost, capacity in [(0, 1, 1, 10**6), (0, 2, 1, 500), (0, 3, 10, 10**6), (2, 3, 2, 10**6)]:
+            G.add_edge(u, v, cost=cost, capacity=capacity)
+        N = {(0, 3): 1}
+        added, reliability = greedy_edge_addition(G, N, 1, 0.01, 1000, 1, iterations=10,
+                                                  rng=np.random.default_rng(0), capacity=10**6, cost=2)
+        self.assertEqual(added, [(1, 3)])
+        self.assertEqual(reliability, [1.0])
+
+        G.add_edge(1, 3, cost=2, capacity=10**6)
+        self.assertEqual(simulate_reliability_batch(G, N, 1, 0.01, 1000, iterations=10, mode='tree'), 1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
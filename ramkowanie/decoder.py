@@ -1,3 +1,5 @@
+from together import remove_bit_stuffing
+
 def tranlate_to_text(binary_message):
     """
     Translates a binary message to text format.
@@ -7,27 +9,6 @@ def tranlate_to_text(binary_message):
     decoded_message = ''.join(ascii_characters)
     return decoded_message
 
-def remove_bit_stuffing(message):
-    """
-    Removes bit stuffing from a message.
-    """
-    unstuffed_message = ''
-    count = 0
-    i = 0
-    while i < len(message):
-        if message[i] == '1':
-            count += 1
-            unstuffed_message += '1'
-            if count == 5 and i + 1 < len(message) and message[i + 1] == '0':
-                # Skip the stuffed 0 bit after five consecutive 1s
-                i += 1
-                count = 0
-        else:
-            unstuffed_message += '0'
-            count = 0
-        i += 1
-    return unstuffed_message
-
 def crc_remainder(message, polynomial):
     """
     Computes the CRC remainder of a message divided by the polynomial.
@@ -1,3 +1,5 @@
+from together import add_bit_stuffing
+
 def tranlate_to_binaries(message):
     """
     Translates a message to binary format.
@@ -5,24 +7,6 @@ def tranlate_to_binaries(message):
     binary_message = ''.join(format(ord(char), '08b') for char in message)
     return binary_message
 
-def add_bit_stuffing(message):
-    """
-    Adds bit stuffing to a message.
-    """
-    stuffed_message = ''
-    count = 0
-    for bit in message:
-        if bit == '1':
-            count += 1
-            stuffed_message += bit
-            if count == 5:
-                stuffed_message += '0'  # Add a 0 after five consecutive 1s
-                count = 0
-        else:
-            stuffed_message += bit
-            count = 0
-    return stuffed_message
-
 def add_header(message):
     """
     Adds header to a message.
@@ -1,3 +1,5 @@
+from together import add_bit_stuffing, remove_bit_stuffing
+
 def tranlate_to_binaries (message):
     """
     Translates a message to binary format.
@@ -14,42 +16,6 @@ def tranlate_to_text (binary_message):
     decoded_message = ''.join(ascii_characters)
     return decoded_message
 
-def add_bit_stuffing (message):
-    """
-    Adds bit stuffing to a message.
-    """
-    stuffed_message = ''
-    count = 0
-    for bit in message:
-        if bit == '1':
-            count += 1
-            if count == 5:
-                stuffed_message += '1' + '0'
-                count = 0
-            else:
-                stuffed_message += bit
-        else:
-            stuffed_message += bit
-            count = 0
-    return stuffed_message
-
-def remove_bit_stuffing (message):
-    """
-    Removes bit stuffing from a message. Assumes that header has been removed.
-    """
-    unstuffed_message = ''
-    count = 0
-    for bit in message:
-        if bit == '1':
-            count += 1
-            if count == 5:
-                continue
-        else:
-            count = 0
-        unstuffed_message += bit
-    return unstuffed_message
-
-
 def add_header (message):
     return '01111110' + message + '01111110'
 
@@ -129,9 +95,9 @@ def process_received_message():
         print(f"Received Message: {message}")
         frames = detect_frames(message)
         for frame in frames:
-            removed_header = detect_frames(frame)
-            print(f"Removed Message: {removed_header}")
-            unstuffed_message = remove_bit_stuffing(removed_header)
+            # detect_frames already split the message at the headers
+            print(f"Removed Message: {frame}")
+            unstuffed_message = remove_bit_stuffing(frame)
             print(f"Unstuffed Message: {unstuffed_message}")
             decoded_message += tranlate_to_text(unstuffed_message)
     print(f"Decoded message: {decoded_message}")
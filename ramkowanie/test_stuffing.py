@@ -0,0 +1,122 @@
+import random
+import unittest
+
+from together import (BitWriter, add_bit_stuffing, pack_bits, remove_bit_stuffing, stuff_bits,
+                      unpack_bits, unstuff_bits)
+
+
+def reference_add_bit_stuffing(message):
+    """
+    Original string implementation of add_bit_stuffing.
+    """
+    stuffed_message = ''
+    count = 0
+    for bit in message:
+        if bit == '1':
+            count += 1
+            stuffed_message += bit
+            if count == 5:
+                stuffed_message += '0'  # Add a 0 after five consecutive 1s
+                count = 0
+        else:
+            stuffed_message += bit
+            count = 0
+    return stuffed_message
+
+def reference_remove_bit_stuffing(message):
+    """
+    Original string implementation of remove_bit_stuffing.
+    """
+    unstuffed_message = ''
+    count = 0
+    i = 0
+    while i < len(message):
+        if message[i] == '1':
+            count += 1
+            unstuffed_message += '1'
+            if count == 5 and i + 1 < len(message) and message[i + 1] == '0':
+                # Skip the stuffed 0 bit after five consecutive 1s
+                i += 1
+                count = 0
+        else:
+            unstuffed_message += '0'
+            count = 0
+        i += 1
+    return unstuffed_message
+
+def random_bits(rng, max_length=80):
+    """
+    Random bit string; the density of 1s varies, so long runs of 1s are common.
+    """
+    density = rng.choice([0.5, 0.8, 0.95, 1.0])
+    return ''.join('1' if rng.random() < density else '0' for _ in range(rng.randrange(max_length)))
+
+def run_in_pieces(function, bits, cuts):
+    """
+    Feeds bits to stuff_bits/unstuff_bits split at the positions in cuts, passing the returned
+    state to the next call. Returns the output as a bit string.
+    """
+    writer = BitWriter()
+    state = 0
+    for start, end in zip([0] + cuts, cuts + [len(bits)]):
+        data, nbits = pack_bits(bits[start:end])
+        state = function(data, writer, nbits, state)
+    return unpack_bits(writer.getvalue(), writer.nbits)
+
+
+class StuffingTest(unittest.TestCase):
+    CASES = 3000
+
+    def setUp(self):
+        self.rng = random.Random(2024)
+
+    def test_round_trip(self):
+        for _ in range(self.CASES):
+            bits = random_bits(self.rng)
+            self.assertEqual(remove_bit_stuffing(add_bit_stuffing(bits)), bits)
+
+    def test_matches_reference(self):
+        for _ in range(self.CASES):
+            bits = random_bits(self.rng)
+            self.assertEqual(add_bit_stuffing(bits), reference_add_bit_stuffing(bits))
+            self.assertEqual(remove_bit_stuffing(bits), reference_remove_bit_stuffing(bits))
+
+    def test_no_six_ones(self):
+        for _ in range(self.CASES):
+            self.assertNotIn('111111', add_bit_stuffing(random_bits(self.rng)))
+
+    def test_round_trip_in_pieces(self):
+        for _ in range(self.CASES):
+            bits = random_bits(self.rng)
+            stuffed = add_bit_stuffing(bits)
+            cuts = sorted(self.rng.randrange(len(bits) + 1) for _ in range(self.rng.randrange(4)))
+            self.assertEqual(run_in_pieces(stuff_bits, bits, cuts), stuffed)
+            cuts = sorted(self.rng.randrange(len(stuffed) + 1) for _ in range(self.rng.randrange(4)))
+            self.assertEqual(run_in_pieces(unstuff_bits, stuffed, cuts), bits)
+
+    def test_packed_round_trip(self):
+        for _ in range(300):
+            data = bytes(self.rng.choice([0x00, 0x7E, 0xFF, self.rng.randrange(256)])
+                         for _ in range(self.rng.randrange(200)))
+            stuffed = BitWriter()
+            stuff_bits(data, stuffed)
+            unstuffed = BitWriter()
+            unstuff_bits(stuffed.getvalue(), unstuffed, stuffed.nbits)
+            self.assertEqual(unstuffed.getvalue(), data)
+            self.assertEqual(unstuffed.nbits, len(data) * 8)
+
+    def test_writer_offset(self):
+        # Output appended to a writer that already holds a partial byte
+        for _ in range(self.CASES // 10):
+            prefix = random_bits(self.rng, 12)
+            bits = random_bits(self.rng)
+            writer = BitWriter()
+            if prefix:
+                writer.write(int(prefix, 2), len(prefix))
+            data, nbits = pack_bits(bits)
+            stuff_bits(data, writer, nbits)
+            self.assertEqual(unpack_bits(writer.getvalue(), writer.nbits), prefix + add_bit_stuffing(bits))
+
+
+if __name__ == '__main__':
+    unittest.main()
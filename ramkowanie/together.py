@@ -1,60 +1,201 @@
+import binascii
+import codecs
+import os
 import random
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
 
 def tranlate_to_binaries(message):
     """
-    Translates a message to binary format.
+    Translates a message to binary format (8 bits per byte of its UTF-8 encoding).
     """
-    binary_message = ''.join(format(ord(char), '08b') for char in message)
+    binary_message = ''.join(format(byte, '08b') for byte in message.encode('utf-8'))
     return binary_message
 
 def tranlate_to_text(binary_message):
     """
-    Translates a binary message to text format.
+    Translates a binary message to text format (UTF-8; invalid sequences are replaced).
     """
     binary_values = [binary_message[i:i+8] for i in range(0, len(binary_message), 8)]
-    ascii_characters = [chr(int(bv, 2)) for bv in binary_values]
-    decoded_message = ''.join(ascii_characters)
+    decoded_message = bytes(int(bv, 2) for bv in binary_values).decode('utf-8', errors='replace')
     return decoded_message
 
+FLAG = 0x7E
+
+class BitWriter:
+    """
+    Collects bits MSB-first into a bytearray.
+    """
+    def __init__(self):
+        self.buffer = bytearray()
+        self.nbits = 0
+        self._acc = 0
+        self._pending = 0
+
+    def write(self, value, nbits):
+        """
+        Appends the nbits lowest bits of value, most significant first.
+        """
+        acc = (self._acc << nbits) | (value & ((1 << nbits) - 1))
+        pending = self._pending + nbits
+        self.nbits += nbits
+        if pending >= 8:
+            whole = pending >> 3
+            pending &= 7
+            self.buffer += (acc >> pending).to_bytes(whole, 'big')
+            acc &= (1 << pending) - 1
+        self._acc = acc
+        self._pending = pending
+
+    def getvalue(self):
+        """
+        Returns the bits written so far as bytes, zero-padded to a whole byte at the end.
+        """
+        if self._pending:
+            return bytes(self.buffer) + bytes([(self._acc << (8 - self._pending)) & 0xFF])
+        return bytes(self.buffer)
+
+    def take(self):
+        """
+        Removes and returns the whole bytes written so far; the bits of an unfinished byte stay.
+        nbits keeps counting all bits written.
+        """
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+def pack_bits(message):
+    """
+    Packs a '0'/'1' string into bytes (MSB-first, zero-padded). Returns (bytes, number of bits).
+    """
+    nbits = len(message)
+    if not nbits:
+        return b'', 0
+    padding = -nbits % 8
+    return int(message + '0' * padding, 2).to_bytes((nbits + padding) // 8, 'big'), nbits
+
+def unpack_bits(data, nbits):
+    """
+    Returns the first nbits bits of packed data as a '0'/'1' string.
+    """
+    if not nbits:
+        return ''
+    return format(int.from_bytes(data, 'big'), f'0{len(data) * 8}b')[:nbits]
+
+def _stuff_step(state, bit):
+    """
+    One input bit of bit stuffing. state is the number of consecutive 1s written (0-4).
+    Returns (output bits, number of output bits, new state).
+    """
+    if not bit:
+        return 0, 1, 0
+    if state == 4:
+        return 0b10, 2, 0
+    return 1, 1, state + 1
+
+def _unstuff_step(state, bit):
+    """
+    One input bit of bit unstuffing, with the semantics of the original remove_bit_stuffing:
+    states 0-4 count consecutive 1s, 5 means five 1s were read (a following 0 is dropped)
+    and 6 means more than five 1s were read (nothing is dropped until the next 0).
+    Returns (output bits, number of output bits, new state).
+    """
+    if state == 5:
+        return (1, 1, 6) if bit else (0, 0, 0)
+    if not bit:
+        return 0, 1, 0
+    return 1, 1, 6 if state == 6 else state + 1
+
+def _stuffing_table(step, states):
+    """
+    Precomputes step for whole bytes: entry [state << 8 | byte] is
+    (output bits, number of output bits, new state) after the 8 bits of byte.
+    """
+    table = [None] * (states << 8)
+    for state in range(states):
+        for byte in range(256):
+            value, nbits, current = 0, 0, state
+            for i in range(7, -1, -1):
+                bits, n, current = step(current, (byte >> i) & 1)
+                value = (value << n) | bits
+                nbits += n
+            table[state << 8 | byte] = (value, nbits, current)
+    return table
+
+_STUFF_TABLE = _stuffing_table(_stuff_step, 5)
+_UNSTUFF_TABLE = _stuffing_table(_unstuff_step, 7)
+
+def _run_stuffing(table, step, data, writer, nbits, state):
+    """
+    Feeds the first nbits bits of data through a stuffing table a byte at a time
+    (the bits of a last partial byte go through step) and appends the output to writer.
+    Returns the state after the last bit.
+    """
+    if nbits is None:
+        nbits = len(data) * 8
+    whole = nbits >> 3
+    out = writer.buffer
+    start = len(out) * 8 + writer._pending
+    acc = writer._acc
+    pending = writer._pending
+    for byte in memoryview(data)[:whole]:
+        value, n, state = table[state << 8 | byte]
+        acc = (acc << n) | value
+        pending += n
+        if pending >= 8:
+            pending -= 8
+            if pending >= 8:
+                pending -= 8
+                out.append(acc >> (pending + 8))
+            out.append((acc >> pending) & 0xFF)
+            acc &= (1 << pending) - 1
+    for i in range(whole * 8, nbits):
+        value, n, state = step(state, (data[i >> 3] >> (7 - (i & 7))) & 1)
+        acc = (acc << n) | value
+        pending += n
+        if pending >= 8:
+            pending -= 8
+            out.append(acc >> pending)
+            acc &= (1 << pending) - 1
+    writer._acc = acc
+    writer._pending = pending
+    writer.nbits += len(out) * 8 + pending - start
+    return state
+
+def stuff_bits(data, writer, nbits=None, state=0):
+    """
+    Writes the first nbits bits of data (bytes; all of them by default) to writer,
+    adding a 0 after five consecutive 1s. Works a byte at a time on a precomputed table.
+    Returns the state to pass to the next call when a bit stream is stuffed in pieces.
+    """
+    return _run_stuffing(_STUFF_TABLE, _stuff_step, data, writer, nbits, state)
+
+def unstuff_bits(data, writer, nbits=None, state=0):
+    """
+    Removes bit stuffing from the first nbits bits of data, like remove_bit_stuffing,
+    and writes the result to writer. Returns the state for the next piece of the stream.
+    """
+    return _run_stuffing(_UNSTUFF_TABLE, _unstuff_step, data, writer, nbits, state)
+
 def add_bit_stuffing(message):
     """
-    Adds bit stuffing to a message.
-    """
-    stuffed_message = ''
-    count = 0
-    for bit in message:
-        if bit == '1':
-            count += 1
-            stuffed_message += bit
-            if count == 5:
-                stuffed_message += '0'  # Add a 0 after five consecutive 1s
-                count = 0
-        else:
-            stuffed_message += bit
-            count = 0
-    return stuffed_message
+    Adds bit stuffing to a message (a 0 after five consecutive 1s).
+    """
+    data, nbits = pack_bits(message)
+    writer = BitWriter()
+    stuff_bits(data, writer, nbits)
+    return unpack_bits(writer.getvalue(), writer.nbits)
 
 def remove_bit_stuffing(message):
     """
-    Removes bit stuffing from a message.
+    Removes bit stuffing from a message (the 0 following five consecutive 1s).
     """
-    unstuffed_message = ''
-    count = 0
-    i = 0
-    while i < len(message):
-        if message[i] == '1':
-            count += 1
-            unstuffed_message += '1'
-            if count == 5 and i + 1 < len(message) and message[i + 1] == '0':
-                # Skip the stuffed 0 bit after five consecutive 1s
-                i += 1
-                count = 0
-        else:
-            unstuffed_message += '0'
-            count = 0
-        i += 1
-    return unstuffed_message
+    data, nbits = pack_bits(message)
+    writer = BitWriter()
+    unstuff_bits(data, writer, nbits)
+    return unpack_bits(writer.getvalue(), writer.nbits)
 
 def add_header(message):
     """
@@ -93,6 +234,253 @@ def detect_frames(message):
                 frames.append(part)
     return frames
 
+def _zlib_crc32(data, register):
+    """zlib.crc32 on the register (zlib keeps the CRC after the final XOR)."""
+    return zlib.crc32(data, register ^ 0xFFFFFFFF) ^ 0xFFFFFFFF
+
+def _gf2_apply(matrix, vector):
+    """
+    Multiplies a GF(2) matrix (list of column bit masks) by a vector (bit mask).
+    """
+    result = 0
+    i = 0
+    while vector:
+        if vector & 1:
+            result ^= matrix[i]
+        vector >>= 1
+        i += 1
+    return result
+
+def _reflect(value, width):
+    """
+    Reverses the order of the lowest width bits of value.
+    """
+    return int(format(value, f'0{width}b')[::-1], 2)
+
+class CRC:
+    """
+    Table-driven CRC with configurable width, polynomial, initial value, bit reflection
+    and final XOR (the usual Rocksoft parameters). Data is processed four bytes at a time
+    with slicing-by-4 tables; CRC-16 with polynomial 0x1021 (non-reflected) and CRC-32
+    use the C implementations in binascii and zlib.
+    """
+    def __init__(self, width, poly, init=0, refin=False, refout=False, xorout=0):
+        self.width = width
+        self.poly = poly
+        self.init = init
+        self.refin = refin
+        self.refout = refout
+        self.xorout = xorout
+        self.mask = (1 << width) - 1
+        self._fast = None
+        if (width, poly, refin) == (16, 0x1021, False):
+            self._fast = binascii.crc_hqx
+        elif (width, poly, refin) == (32, 0x04C11DB7, True):
+            self._fast = _zlib_crc32
+        # tables[k][b]: register after byte b followed by k zero bytes, starting from 0
+        self.tables = [[self._update_bits(0, b, 8) for b in range(256)]]
+        for _ in range(3):
+            self.tables.append([self._update_bits(c, 0, 8) for c in self.tables[-1]])
+        # _zero_powers[k]: GF(2) matrix advancing the register over 2^k zero bytes (built on demand)
+        self._zero_powers = [[self._update_bits(1 << i, 0, 8) for i in range(width)]]
+
+    @classmethod
+    def from_polynomial(cls, polynomial):
+        """
+        Plain polynomial division as in add_crc: polynomial is a bit string such as
+        '10001000000100001', initial value 0, no reflection and no final XOR.
+        """
+        return cls(len(polynomial) - 1, int(polynomial[1:], 2))
+
+    def _update_bits(self, register, value, nbits):
+        """
+        Feeds the nbits lowest bits of value into the register one bit at a time
+        (most significant first, or least significant first for reflected input).
+        """
+        if self.refin:
+            poly = _reflect(self.poly, self.width)
+            for i in range(nbits):
+                bit = (register ^ (value >> i)) & 1
+                register >>= 1
+                if bit:
+                    register ^= poly
+            return register
+        for i in range(nbits - 1, -1, -1):
+            bit = ((register >> (self.width - 1)) ^ (value >> i)) & 1
+            register = (register << 1) & self.mask
+            if bit:
+                register ^= self.poly
+        return register
+
+    def initial(self):
+        """Register value before any data."""
+        return _reflect(self.init, self.width) if self.refin else self.init
+
+    def update(self, register, data):
+        """
+        Feeds bytes into the register and returns the new register value.
+        """
+        if self._fast is not None:
+            return self._fast(data, register)
+        t0, t1, t2, t3 = self.tables
+        width = self.width
+        end = len(data) - len(data) % 4 if width <= 32 else 0
+        if self.refin:
+            for i in range(0, end, 4):
+                x = register ^ int.from_bytes(data[i:i + 4], 'little')
+                register = (register >> 32) ^ t3[x & 0xFF] ^ t2[(x >> 8) & 0xFF] ^ t1[(x >> 16) & 0xFF] ^ t0[(x >> 24) & 0xFF]
+            for byte in data[end:]:
+                register = (register >> 8) ^ t0[(register ^ byte) & 0xFF]
+            return register
+        for i in range(0, end, 4):
+            x = (register << (32 - width)) ^ int.from_bytes(data[i:i + 4], 'big')
+            register = t3[x >> 24] ^ t2[(x >> 16) & 0xFF] ^ t1[(x >> 8) & 0xFF] ^ t0[x & 0xFF]
+        for byte in data[end:]:
+            if width >= 8:
+                register = ((register << 8) & self.mask) ^ t0[((register >> (width - 8)) ^ byte) & 0xFF]
+            else:
+                register = t0[(register << (8 - width)) ^ byte]
+        return register
+
+    def finish(self, register):
+        """Final CRC value from the register (output reflection and final XOR)."""
+        if self.refin != self.refout:
+            register = _reflect(register, self.width)
+        return register ^ self.xorout
+
+    def compute(self, data):
+        """CRC of bytes."""
+        return self.finish(self.update(self.initial(), data))
+
+    def new(self, data=b''):
+        """Incremental CRC object (CRCStream) for data arriving in chunks."""
+        stream = CRCStream(self)
+        stream.update(data)
+        return stream
+
+    def _unfinish(self, crc):
+        """Register value for a final CRC value (inverse of finish)."""
+        crc ^= self.xorout
+        return _reflect(crc, self.width) if self.refin != self.refout else crc
+
+    def _advance_zeros(self, register, nbytes):
+        """
+        Register after nbytes zero bytes, as a product of matrix powers - O(width^2 log nbytes).
+        """
+        k = 0
+        while nbytes:
+            if k == len(self._zero_powers):
+                square = self._zero_powers[-1]
+                self._zero_powers.append([_gf2_apply(square, column) for column in square])
+            if nbytes & 1:
+                register = _gf2_apply(self._zero_powers[k], register)
+            nbytes >>= 1
+            k += 1
+        return register
+
+    def combine(self, crc_a, crc_b, len_b):
+        """
+        CRC of the concatenation A + B from crc_a = CRC(A), crc_b = CRC(B) and len_b = len(B) in bytes.
+        The register update is affine: after B it is M^len_b * (register before B) xor (a term
+        depending only on B), so register(A + B) = M^len_b * (register(A) xor initial) xor register(B).
+        """
+        register = self._advance_zeros(self._unfinish(crc_a) ^ self.initial(), len_b)
+        return self.finish(register ^ self._unfinish(crc_b))
+
+    def compute_bits(self, bits):
+        """
+        CRC of a '0'/'1' string of any length. Whole bytes go through the tables,
+        the remaining bits are processed one at a time. Reflected CRCs need whole bytes.
+        """
+        whole = len(bits) - len(bits) % 8
+        if whole < len(bits) and self.refin:
+            raise ValueError("Reflected CRC needs a whole number of bytes")
+        data = int(bits[:whole], 2).to_bytes(whole // 8, 'big') if whole else b''
+        register = self.update(self.initial(), data)
+        if whole < len(bits):
+            register = self._update_bits(register, int(bits[whole:], 2), len(bits) - whole)
+        return self.finish(register)
+
+class CRCStream:
+    """
+    Incremental CRC: feed chunks with update() and read the CRC of everything so far with digest().
+    """
+    def __init__(self, engine):
+        self.engine = engine
+        self.length = 0
+        self._register = engine.initial()
+
+    def update(self, chunk):
+        """Adds a chunk of bytes."""
+        self._register = self.engine.update(self._register, chunk)
+        self.length += len(chunk)
+
+    def digest(self):
+        """CRC value (int) of all bytes given so far."""
+        return self.engine.finish(self._register)
+
+    def copy(self):
+        """Independent copy of the current state."""
+        stream = CRCStream(self.engine)
+        stream.length = self.length
+        stream._register = self._register
+        return stream
+
+CRC_PRESETS = {
+    'CRC-16/XMODEM': CRC(16, 0x1021),
+    'CRC-16/IBM': CRC(16, 0x8005, refin=True, refout=True),
+    'CRC-CCITT': CRC(16, 0x1021, init=0xFFFF),
+    'CRC-32': CRC(32, 0x04C11DB7, init=0xFFFFFFFF, refin=True, refout=True, xorout=0xFFFFFFFF),
+}
+DEFAULT_CRC = 'CRC-16/XMODEM'
+_polynomial_engines = {}
+
+def crc_engine(polynomial):
+    """
+    Returns the CRC engine for a preset name from CRC_PRESETS, a CRC object,
+    or a polynomial bit string (engines for bit strings are built once and cached).
+    """
+    if isinstance(polynomial, CRC):
+        return polynomial
+    if polynomial in CRC_PRESETS:
+        return CRC_PRESETS[polynomial]
+    if polynomial not in _polynomial_engines:
+        _polynomial_engines[polynomial] = CRC.from_polynomial(polynomial)
+    return _polynomial_engines[polynomial]
+
+def _chunk_crc(args):
+    """
+    CRC of one chunk for crc_parallel (module-level function, so it can be sent to a process).
+    """
+    engine, chunk = args
+    return engine.compute(chunk), len(chunk)
+
+def crc_parallel(data, crc=DEFAULT_CRC, workers=None, chunk_size=1 << 20):
+    """
+    CRC of a large buffer computed in chunks of chunk_size bytes on a process pool
+    (workers=None uses all cores, 1 runs without a pool); the chunk CRCs are merged with combine.
+    Chunks are sliced and submitted lazily, at most two per process at a time, so besides data
+    only a bounded number of chunks is in memory; data can also be an mmap.mmap of a file.
+    crc is anything crc_engine accepts.
+    """
+    engine = crc_engine(crc)
+    tasks = ((engine, data[i:i + chunk_size]) for i in range(0, len(data), chunk_size))
+    value = engine.compute(b'')
+    if workers == 1:
+        for task in tasks:
+            value = engine.combine(value, *_chunk_crc(task))
+        return value
+    in_flight = 2 * (workers or os.cpu_count() or 1)
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for task in tasks:
+            pending.append(pool.submit(_chunk_crc, task))
+            if len(pending) >= in_flight:
+                value = engine.combine(value, *pending.popleft().result())
+        while pending:
+            value = engine.combine(value, *pending.popleft().result())
+    return value
+
 def crc_remainder(message, polynomial):
     """
     Computes the CRC remainder of a message divided by the polynomial.
@@ -101,123 +489,220 @@ def crc_remainder(message, polynomial):
     if len(message) < poly_len:
         # Pad with zeros if message is shorter than polynomial
         message = message + '0' * (poly_len - len(message))
-    remainder = list(message[:poly_len - 1])
-    for i in range(poly_len - 1, len(message)):
-        remainder.append(message[i])
-        if remainder[0] == '1':
-            for j in range(poly_len):
-                if j < len(remainder):
-                    remainder[j] = '0' if remainder[j] == polynomial[j] else '1'
-        remainder.pop(0)
-    return ''.join(remainder)
+    width = poly_len - 1
+    # remainder(A * x^width + B) = crc(A) xor B for the last width bits B
+    remainder = crc_engine(polynomial).compute_bits(message[:-width]) ^ int(message[-width:], 2)
+    return format(remainder, f'0{width}b')
 
 def add_crc(message, polynomial='10001000000100001'):
     """
     Adds CRC to a message using the specified polynomial.
-    Default polynomial is CRC-16-IBM (0x8005 in reverse bit order).
+    polynomial is a bit string (plain division; the default '10001000000100001' is 0x1021,
+    i.e. CRC-16/XMODEM), a preset name from CRC_PRESETS or a CRC object.
     """
-    # Append zeros to the message equal to polynomial length-1
-    padded_message = message + '0' * (len(polynomial) - 1)
-    # Compute remainder
-    remainder = crc_remainder(padded_message, polynomial)
-    # Append the remainder (checksum) to the original message
-    return message + remainder
+    engine = crc_engine(polynomial)
+    return message + format(engine.compute_bits(message), f'0{engine.width}b')
 
 def verify_crc(message, polynomial='10001000000100001'):
     """
-    Verifies CRC of a message using the specified polynomial.
+    Verifies CRC of a message using the specified polynomial (as in add_crc).
     Returns original message without CRC if valid, otherwise raises exception.
     """
-    poly_len = len(polynomial)
-    if len(message) < poly_len - 1:
+    engine = crc_engine(polynomial)
+    width = engine.width
+    if len(message) < width:
         raise ValueError("Message too short to contain CRC")
-    # Compute remainder on the entire message (original + CRC)
-    remainder = crc_remainder(message, polynomial)
-    # If remainder is all zeros, CRC is valid
-    if remainder == '0' * (poly_len - 1):
-        return message[:-(poly_len - 1)]
+    data = message[:len(message) - width]
+    # For plain division this is the remainder of the whole message
+    remainder = engine.compute_bits(data) ^ int(message[len(message) - width:], 2)
+    if remainder == 0:
+        return data
     else:
-        raise ValueError(f"CRC check failed. Data may be corrupted. Remainder: {remainder}")
+        raise ValueError(f"CRC check failed. Data may be corrupted. Remainder: {format(remainder, f'0{width}b')}")
 
-def process_message(message, size):
+def _flag_table():
     """
-    Processes message by separating it into frames,
-    adding CRC, bit stuffing, and adding headers.
+    Precomputes flag detection a byte at a time. The state is the length of the flag prefix
+    matched so far (0-7), and after a flag matching starts again, like str.split on '01111110'.
+    Entry [state << 8 | byte] is (number of bits of byte up to the end of a flag, 0 if no flag
+    ends in it, new state); at most one flag can end in a byte.
     """
-    # Clear the contents of the message.txt file before processing
-    with open('message.txt', 'w') as file:
-        file.truncate(0)
-    
-    binary_message = tranlate_to_binaries(message)
+    flag = format(FLAG, '08b')
+    table = []
+    for state in range(8):
+        for byte in range(256):
+            end, current = 0, state
+            for i in range(8):
+                bit = '1' if (byte >> (7 - i)) & 1 else '0'
+                matched = flag[:current] + bit
+                while not flag.startswith(matched):
+                    matched = matched[1:]
+                current = len(matched)
+                if current == 8:
+                    end, current = i + 1, 0
+            table.append((end, current))
+    return table
+
+_FLAG_TABLE = _flag_table()
+
+def _write_frame(writer, engine, frame):
+    """
+    Writes flag, stuffed (frame + CRC), flag to writer.
+    """
+    writer.write(FLAG, 8)
+    stuff_bits(frame + engine.compute(frame).to_bytes(engine.width // 8, 'big'), writer)
+    writer.write(FLAG, 8)
+
+def _check_frame(engine, part, nbits):
+    """
+    Unstuffs the first nbits bits of a part between flags and verifies its CRC.
+    Returns the payload, or None if the frame is rejected.
+    """
+    crc_size = engine.width // 8
+    frame = BitWriter()
+    unstuff_bits(part.getvalue(), frame, nbits)
+    body = frame.buffer[:len(frame.buffer) - crc_size]
+    if (frame.nbits < 8 * crc_size or frame.nbits % 8
+            or engine.compute(body) != int.from_bytes(frame.buffer[len(body):], 'big')):
+        return None
+    return bytes(body)
+
+def encode_frames(chunks, frame_size=4, crc=DEFAULT_CRC):
+    """
+    Streaming frame encoder. Reads data from an iterable of bytes chunks (of any sizes,
+    e.g. iter(lambda: file.read(1 << 20), b'')) and yields the packed output as it is produced.
+    Every frame_size bytes of data become flag, stuffed (payload + CRC), flag - with the default
+    CRC-16/XMODEM the same bit sequence process_message writes for size = 8 * frame_size.
+    crc is anything crc_engine accepts, with a width that is a multiple of 8.
+    Only one frame is kept in memory; the output is zero-padded to a whole byte after the last flag.
+    """
+    engine = crc_engine(crc)
+    writer = BitWriter()
+    pending = bytearray()
+    for chunk in chunks:
+        pending += chunk
+        whole = len(pending) - len(pending) % frame_size
+        for i in range(0, whole, frame_size):
+            _write_frame(writer, engine, bytes(pending[i:i + frame_size]))
+        del pending[:whole]
+        if writer.buffer:
+            yield writer.take()
+    if pending:
+        _write_frame(writer, engine, bytes(pending))
+    tail = writer.getvalue()
+    if tail:
+        yield tail
+
+def decode_frames(chunks, crc=DEFAULT_CRC):
+    """
+    Streaming frame decoder for the output of encode_frames. Reads packed bytes from an iterable
+    of chunks (frames may straddle chunk boundaries), splits them at flags like
+    message.split('01111110') on the text form, removes bit stuffing and verifies the CRC.
+    Yields the payload of every frame, or None for a rejected frame. Empty parts between flags
+    and the zero padding after the last flag are skipped. Only the current frame is kept in memory.
+    """
+    engine = crc_engine(crc)
+    part = BitWriter()
+    state = 0
+    for chunk in chunks:
+        start = 0
+        for i, byte in enumerate(chunk):
+            end, state = _FLAG_TABLE[state << 8 | byte]
+            if end:
+                part.write(int.from_bytes(chunk[start:i], 'big'), 8 * (i - start))
+                part.write(byte >> (8 - end), end)
+                if part.nbits > 8:
+                    yield _check_frame(engine, part, part.nbits - 8)
+                part = BitWriter()
+                part.write(byte, 8 - end)
+                start = i + 1
+        part.write(int.from_bytes(chunk[start:], 'big'), 8 * (len(chunk) - start))
+    if part.nbits >= 8 or part._acc:
+        yield _check_frame(engine, part, part.nbits)
+
+def encode_bytes(data, frame_size=4, crc=DEFAULT_CRC):
+    """
+    Frames bytes for transmission with bits packed into bytes (encode_frames on a single buffer).
+    """
+    return b''.join(encode_frames([data], frame_size, crc))
+
+def decode_bytes(data, crc=DEFAULT_CRC):
+    """
+    Decodes packed frames produced by encode_bytes. Frames that fail are skipped,
+    like in process_received_message. Returns (payload bytes, number of rejected frames).
+    """
+    payload = bytearray()
+    error_frames = 0
+    for frame in decode_frames([data], crc):
+        if frame is None:
+            error_frames += 1
+        else:
+            payload += frame
+    return bytes(payload), error_frames
+
+def process_message(message, size, chunk_size=1 << 16):
+    """
+    Processes message by separating it into frames of size bits,
+    adding CRC, bit stuffing, and adding headers (encode_frames), and writes
+    the frames to message.txt as '0'/'1' text.
+    """
+    if size % 8:
+        raise ValueError("Frame size must be a whole number of bytes")
     print(f"Original Message: {message}")
-    print(f"Binary Message: {binary_message}")
-    
-    frames = seperate_message(binary_message, size)
-    for i, frame in enumerate(frames):
-        print(f"\nFrame {i+1}: {frame}")
-        
-        # Add CRC to frame
-        frame_with_crc = add_crc(frame)
-        print(f"Frame with CRC: {frame_with_crc}")
-        
-        # Add bit stuffing to avoid flag sequence in the data
-        stuffed_message = add_bit_stuffing(frame_with_crc)
-        print(f"Stuffed Message: {stuffed_message}")
-        
-        # Add header flags
-        header_message = add_header(stuffed_message)
-        print(f"Message with header: {header_message}")
-        
-        # Save to file
-        with open('message.txt', 'a') as file:
-            file.write(header_message)
-        print(f"Message with header saved in file")
+    data = message.encode('utf-8')
+    chunks = (data[i:i + chunk_size] for i in range(0, len(data), chunk_size))
+    previous = b''
+    with open('message.txt', 'w') as file:
+        for packed in encode_frames(chunks, size // 8):
+            file.write(unpack_bits(previous, len(previous) * 8))
+            previous = packed
+        if previous:
+            # The output ends with a flag ('...0'); drop the zero padding after it
+            file.write(unpack_bits(previous, len(previous) * 8).rstrip('0') + '0')
+    print(f"Frames saved in file")
+
+def read_bits_text(file, chunk_size=1 << 16):
+    """
+    Reads '0'/'1' text from a file in chunks and yields it packed into bytes.
+    """
+    carry = ''
+    for block in iter(lambda: file.read(chunk_size), ''):
+        block = carry + block
+        whole = len(block) - len(block) % 8
+        carry = block[whole:]
+        if whole:
+            yield pack_bits(block[:whole])[0]
+    if carry:
+        yield pack_bits(carry)[0]
 
 def process_received_message():
     """
     Processes received message by removing headers,
-    removing bit stuffing, verifying CRC, and translating to text.
+    removing bit stuffing, verifying CRC, and translating to text (decode_frames
+    on message.txt read in chunks).
     """
-    decoded_message = ''
+    decoded_message = []
+    # A multi-byte character may span frames
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
     error_frames = 0
     
     try:
         with open('message.txt', 'r') as file:
-            message = file.read()
-            print(f"\nReceived Message: {message}")
-            
-            # Split message into frames using the flag as delimiter
-            raw_frames = message.split('01111110')
-            frames = [frame for frame in raw_frames if frame]  # Remove empty strings
-            
-            print(f"Detected {len(frames)} frames")
-            
-            for i, frame in enumerate(frames):
-                try:
-                    print(f"\nProcessing Frame {i+1}: {frame}")
-                    
-                    # Remove bit stuffing
-                    unstuffed_message = remove_bit_stuffing(frame)
-                    print(f"Unstuffed Message: {unstuffed_message}")
-                    
-                    # Verify CRC
-                    original_message = verify_crc(unstuffed_message)
-                    print(f"Original Message (CRC verified): {original_message}")
-                    
-                    # Translate binary to text
-                    text_chunk = tranlate_to_text(original_message)
-                    decoded_message += text_chunk
-                    print(f"Decoded chunk: '{text_chunk}'")
-                    
-                except ValueError as e:
-                    print(f"Error processing frame {i+1}: {e}")
+            for i, frame in enumerate(decode_frames(read_bits_text(file))):
+                if frame is None:
+                    print(f"Error processing frame {i+1}: CRC check failed. Data may be corrupted.")
                     error_frames += 1
                     # If a frame is corrupted, we might want to request retransmission
                     # For now, we'll just skip it
+                    continue
+                decoded_message.append(decoder.decode(frame))
+                print(f"Frame {i+1} (CRC verified): '{frame.decode('utf-8', errors='replace')}'")
+            decoded_message.append(decoder.decode(b'', final=True))
             
             if error_frames > 0:
                 print(f"\nWARNING: {error_frames} frames had errors and were skipped")
-            
+
+            decoded_message = ''.join(decoded_message)
             print(f"\nFinal decoded message: '{decoded_message}'")
             return decoded_message
             
@@ -262,4 +747,10 @@ if __name__ == "__main__":
     else:
         print("\nWarning: Received message differs from original message.")
         print(f"Original: '{original_message}'")
-        print(f"Received: '{received_message}'")
\ No newline at end of file
+        print(f"Received: '{received_message}'")
+
+    # The same frames with bits packed into bytes instead of '0'/'1' characters
+    packed = encode_bytes(original_message.encode('utf-8'), bytes_in_frames)
+    payload, error_frames = decode_bytes(packed)
+    print(f"\nPacked frames: {len(packed)} bytes (text form: {len(content)} characters)")
+    print(f"Decoded from packed frames: '{payload.decode('utf-8')}', rejected frames: {error_frames}")